@@ -1,5 +1,5 @@
 import adsk.core, adsk.fusion, traceback
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from http import HTTPStatus
 import threading
 import json
@@ -7,20 +7,83 @@ import time
 import queue
 from pathlib import Path
 import math
+import sys
 import os
+import functools
+import contextlib
+import operator
+import concurrent.futures
+from enum import IntEnum
+
+try:
+    import orjson  # optional: schnellere JSON (De)Serialisierung, falls im Add-In installiert
+except ImportError:
+    orjson = None
+
+class Plane(IntEnum):
+    XY = 0
+    XZ = 1
+    YZ = 2
+
+class Axis(IntEnum):
+    X = 0
+    Y = 1
+    Z = 2
+
+class BoolOp(IntEnum):
+    JOIN = 0
+    CUT = 1
+    INTERSECT = 2
+
+# Attributnamen der Konstruktionsebenen/-achsen der rootComponent, Index = Plane/Axis
+PLANE_ATTRIBUTES = ('xYConstructionPlane', 'xZConstructionPlane', 'yZConstructionPlane')
+AXIS_ATTRIBUTES = ('xConstructionAxis', 'yConstructionAxis', 'zConstructionAxis')
+BOOLEAN_OPERATIONS = (
+    adsk.fusion.FeatureOperations.JoinFeatureOperation,
+    adsk.fusion.FeatureOperations.CutFeatureOperation,
+    adsk.fusion.FeatureOperations.IntersectFeatureOperation,
+)
 
 ModelParameterSnapshot = []
 httpd = None
-task_queue = queue.Queue()  # Queue für thread-safe Aktionen
+MAX_QUEUED_TASKS = 4096  # Obergrenze, danach antwortet der Server mit 503
+task_queue = queue.Queue(maxsize=MAX_QUEUED_TASKS)  # Queue für thread-safe Aktionen
+task_available = threading.Event()  # Wird gesetzt, sobald eine Task in der Queue liegt
+dispatch_pending = threading.Event()  # Custom Event gefeuert, aber noch nicht verarbeitet
 
 # Event Handler Variablen
 app = None
 ui = None
 design = None
 handlers = []
+task_handlers = {}  # task name -> Funktion mit gebundenem design/ui
 stopFlag = None
 myCustomEvent = 'MCPTaskEvent'
 customEvent = None
+commandTerminatedHandler = None  # Markiert den Snapshot als veraltet, wenn in Fusion selbst editiert wird
+
+MAX_TASKS_PER_TICK = 64  # Obergrenze pro Custom Event
+# Vorgefertigte Payloads für fireCustomEvent, Index = Anzahl wartender Tasks
+_BATCH_PAYLOADS = tuple(str(n) for n in range(MAX_TASKS_PER_TICK + 1))
+SHUTDOWN_TIMEOUT = 2.0  # Sekunden, die stop() auf den HTTP Server wartet
+REQUEST_TIMEOUT = 10.0  # Socket Timeout pro Verbindung
+MAX_REQUEST_BODY = 16 * 1024 * 1024  # Größere Bodies werden mit 413 abgelehnt, ohne sie zu lesen
+LOG_REQUESTS = False  # Jede Anfrage nach stderr loggen (Debugging)
+DEBUG = bool(os.environ.get('MCP_DEBUG'))  # Vollständige Tracebacks in Fehlermeldungen
+DISPATCH_TIMEOUT = 5.0  # Sekunden, nach denen ein nicht verarbeitetes Event erneut gefeuert wird
+MIN_POLL_INTERVAL = 0.001  # Backoff des TaskThreads, solange die UI beschäftigt ist
+MAX_POLL_INTERVAL = 0.2
+# Tasks, die das Modell nicht verändern und daher keinen neuen Parameter Snapshot brauchen
+READ_ONLY_TASKS = frozenset({'export_stl', 'export_step', 'select_body', 'select_sketch', 'refresh_parameters'})
+_param_dirty = True  # Wird von Tasks gesetzt, die das Modell verändern
+_param_cache_version = None  # parameter_revision() beim letzten Snapshot
+PARAMETER_TIMEOUT = 5.0  # Sekunden, die ein GET auf einen neuen Snapshot wartet
+PARAMETER_TTL = 1.0  # Sekunden, die ein sauberer Snapshot ohne Rückfrage beim UI Thread gilt
+_param_checked = 0.0  # time.monotonic() des letzten refresh_parameters
+_refresh_lock = threading.Lock()
+_pending_refresh = None  # Future des gequeueten refresh_parameters, geteilt von allen wartenden GETs
+# Zielordner für STEP/STL Exporte, einmal beim Laden bestimmt
+EXPORT_ROOT = os.path.join(os.environ.get('USERPROFILE', os.path.expanduser('~')), 'Desktop', 'Fusion_Exports')
 
 #Event Handler Class
 class TaskEventHandler(adsk.core.CustomEventHandler):
@@ -32,110 +95,158 @@ class TaskEventHandler(adsk.core.CustomEventHandler):
         super().__init__()
         
     def notify(self, args):
-        global task_queue, ModelParameterSnapshot, design, ui
+        global task_queue, design, ui, _param_dirty
+        # Ab hier werden alle wartenden Tasks mit abgearbeitet
+        dispatch_pending.clear()
+        task_available.clear()
         try:
             if design:
-                # Parameter Snapshot aktualisieren
-                ModelParameterSnapshot = get_model_parameters(design)
-                
-                # Task-Queue abarbeiten
-                while not task_queue.empty():
+                # Task-Queue abarbeiten: so viele Tasks wie beim Feuern in der Queue lagen
+                # (maximal MAX_TASKS_PER_TICK, damit die UI reaktiv bleibt)
+                tasks, remaining = take_tasks(batch_size(args))
+                for name, task_args in tasks:
+                    handler = task_handlers.get(name)
+                    if handler is None:
+                        continue
+                    if name not in READ_ONLY_TASKS:
+                        _param_dirty = True
                     try:
-                        task = task_queue.get_nowait()
-                        self.process_task(task)
-                    except queue.Empty:
-                        break
+                        handler(*task_args)
                     except Exception as e:
                         if ui:
                             ui.messageBox(f"Task-Fehler: {str(e)}")
-                        continue
+
+                # Restliche Tasks im nächsten Event abarbeiten
+                if remaining:
+                    task_available.set()
                         
         except Exception as e:
 
             pass
-    
-    def process_task(self, task):
-        """Verarbeitet eine einzelne Task"""
-        global design, ui
-        
-        if task[0] == 'set_parameter':
-            set_parameter(design, ui, task[1], task[2])
-        elif task[0] == 'draw_box':
-            
-            draw_Box(design, ui, task[1], task[2], task[3], task[4], task[5], task[6], task[7])
-            
-        elif task[0] == 'draw_witzenmann':
-            draw_Witzenmann(design, ui, task[1],task[2])
-        elif task[0] == 'export_stl':
-
-            export_as_STL(design, ui, task[1])
-        elif task[0] == 'fillet_edges':
-            fillet_edges(design, ui, task[1])
-        elif task[0] == 'export_step':
-
-            export_as_STEP(design, ui, task[1])
-        elif task[0] == 'draw_cylinder':
-            draw_cylinder(design, ui, task[1], task[2], task[3], task[4], task[5],task[6])
-        elif task[0] == 'shell_body':
-            shell_existing_body(design, ui, task[1], task[2])
-        elif task[0] == 'undo':
-            undo(design, ui)
-        elif task[0] == 'draw_lines':
-            draw_lines(design, ui, task[1], task[2])
-        elif task[0] == 'extrude_last_sketch':
-            extrude_last_sketch(design, ui, task[1],task[2])
-        elif task[0] == 'revolve_profile':
-            # 'rootComp = design.rootComponent
-            # sketches = rootComp.sketches
-            # sketch = sketches.item(sketches.count - 1)  # Letzter Sketch
-            # axisLine = sketch.sketchCurves.sketchLines.item(0)  # Erste Linie als Achse'
-            revolve_profile(design, ui,  task[1])        
-        elif task[0] == 'arc':
-            arc(design, ui, task[1], task[2], task[3], task[4],task[5])
-        elif task[0] == 'draw_one_line':
-            draw_one_line(design, ui, task[1], task[2], task[3], task[4], task[5], task[6], task[7])
-        elif task[0] == 'holes': #task format: ('holes', points, width, depth, through, faceindex)
-            # task[3]=depth, task[4]=through, task[5]=faceindex
-            holes(design, ui, task[1], task[2], task[3], task[4])
-        elif task[0] == 'circle':
-            draw_circle(design, ui, task[1], task[2], task[3], task[4],task[5])
-        elif task[0] == 'extrude_thin':
-            extrude_thin(design, ui, task[1],task[2])
-        elif task[0] == 'select_body':
-            select_body(design, ui, task[1])
-        elif task[0] == 'select_sketch':
-            select_sketch(design, ui, task[1])
-        elif task[0] == 'spline':
-            spline(design, ui, task[1], task[2])
-        elif task[0] == 'sweep':
-            sweep(design, ui)
-        elif task[0] == 'cut_extrude':
-            cut_extrude(design,ui,task[1])
-        elif task[0] == 'circular_pattern':
-            circular_pattern(design,ui,task[1],task[2],task[3])
-        elif task[0] == 'offsetplane':
-            offsetplane(design,ui,task[1],task[2])
-        elif task[0] == 'loft':
-            loft(design, ui, task[1])
-        elif task[0] == 'ellipsis':
-            draw_ellipis(design,ui,task[1],task[2],task[3],task[4],task[5],task[6],task[7],task[8],task[9],task[10])
-        elif task[0] == 'draw_sphere':
-            create_sphere(design, ui, task[1], task[2], task[3], task[4])
-        elif task[0] == 'threaded':
-            create_thread(design, ui, task[1], task[2])
-        elif task[0] == 'delete_everything':
-            delete(design, ui)
-        elif task[0] == 'boolean_operation':
-            boolean_operation(design,ui,task[1])
-        elif task[0] == 'draw_2d_rectangle':
-            draw_2d_rect(design, ui, task[1], task[2], task[3], task[4], task[5], task[6], task[7])
-        elif task[0] == 'rectangular_pattern':
-            rect_pattern(design,ui,task[1],task[2],task[3],task[4],task[5],task[6],task[7])
-        elif task[0] == 'draw_text':
-            draw_text(design, ui, task[1], task[2], task[3], task[4], task[5], task[6], task[7], task[8], task[9],task[10])
-        elif task[0] == 'move_body':
-            move_last_body(design,ui,task[1],task[2],task[3])
-        
+
+
+class CommandTerminatedHandler(adsk.core.ApplicationCommandEventHandler):
+    """
+    Fires after every command the user runs in Fusion (edit feature, change parameters, ...).
+    Such edits can change parameter values without changing parameter_revision(),
+    so the next GET rebuilds the snapshot
+    """
+    def __init__(self):
+        super().__init__()
+
+    def notify(self, args):
+        global _param_dirty
+        _param_dirty = True
+
+
+def register_task_handlers(design, ui):
+    """
+    Binds design and ui once to every task function,
+    so notify can call them directly from the table
+    """
+    def _sphere(radius, x, y, z, plane=None):
+        # plane wird von create_sphere nicht verwendet
+        create_sphere(design, ui, radius, x, y, z)
+
+    task_handlers.clear()
+    task_handlers.update({
+        'set_parameter': functools.partial(set_parameter, design, ui),
+        'draw_box': functools.partial(draw_Box, design, ui),
+        'draw_witzenmann': functools.partial(draw_Witzenmann, design, ui),
+        'export_stl': functools.partial(export_as_STL, design, ui),
+        'fillet_edges': functools.partial(fillet_edges, design, ui),
+        'export_step': functools.partial(export_as_STEP, design, ui),
+        'draw_cylinder': functools.partial(draw_cylinder, design, ui),
+        'shell_body': functools.partial(shell_existing_body, design, ui),
+        'undo': functools.partial(undo, design, ui),
+        'draw_lines': functools.partial(draw_lines, design, ui),
+        'extrude_last_sketch': functools.partial(extrude_last_sketch, design, ui),
+        'revolve_profile': functools.partial(revolve_profile, design, ui),
+        'arc': functools.partial(arc, design, ui),
+        'draw_one_line': functools.partial(draw_one_line, design, ui),
+        'holes': functools.partial(holes, design, ui),  # ('holes', points, width, depth, faceindex)
+        'circle': functools.partial(draw_circle, design, ui),
+        'extrude_thin': functools.partial(extrude_thin, design, ui),
+        'select_body': functools.partial(select_body, design, ui),
+        'select_sketch': functools.partial(select_sketch, design, ui),
+        'spline': functools.partial(spline, design, ui),
+        'sweep': functools.partial(sweep, design, ui),
+        'cut_extrude': functools.partial(cut_extrude, design, ui),
+        'circular_pattern': functools.partial(circular_pattern, design, ui),
+        'offsetplane': functools.partial(offsetplane, design, ui),
+        'loft': functools.partial(loft, design, ui),
+        'ellipsis': functools.partial(draw_ellipis, design, ui),
+        'draw_sphere': _sphere,
+        'threaded': functools.partial(create_thread, design, ui),
+        'delete_everything': functools.partial(delete, design, ui),
+        'boolean_operation': functools.partial(boolean_operation, design, ui),
+        'draw_2d_rectangle': functools.partial(draw_2d_rect, design, ui),
+        'rectangular_pattern': functools.partial(rect_pattern, design, ui),
+        'draw_text': functools.partial(draw_text, design, ui),
+        'move_body': functools.partial(move_last_body, design, ui),
+        'refresh_parameters': functools.partial(refresh_parameters, design),
+    })
+
+
+def queue_task(name, args=()):
+    """
+    Puts a task (name, args) into the queue and wakes up the TaskThread,
+    returns False if the queue is full
+    """
+    try:
+        task_queue.put_nowait((name, args))
+    except queue.Full:
+        task_available.set()
+        return False
+    if not task_available.is_set():
+        task_available.set()
+    return True
+
+def queue_tasks(tasks):
+    """
+    Puts several tasks into the queue with a single lock acquisition.
+    Either all tasks are queued or none, returns False if they do not fit
+    """
+    if not tasks:
+        return True
+    with task_queue.mutex:
+        pending = task_queue.queue
+        if len(pending) + len(tasks) > task_queue.maxsize:
+            fits = False
+        else:
+            fits = True
+            pending.extend(tasks)
+            task_queue.unfinished_tasks += len(tasks)
+            task_queue.not_empty.notify(len(tasks))
+    task_available.set()
+    return fits
+
+def take_tasks(count):
+    """
+    Takes up to count tasks out of the queue with a single lock acquisition.
+    Returns the tasks and whether more tasks are left in the queue
+    """
+    with task_queue.mutex:
+        pending = task_queue.queue
+        tasks = [pending.popleft() for _ in range(min(count, len(pending)))]
+        if tasks:
+            task_queue.not_full.notify(len(tasks))
+        return tasks, bool(pending)
+
+def clear_tasks():
+    """Drops all pending tasks with a single lock acquisition"""
+    with task_queue.mutex:
+        task_queue.queue.clear()
+        task_queue.unfinished_tasks = 0
+        task_queue.all_tasks_done.notify_all()
+        task_queue.not_full.notify_all()
+
+def batch_size(args):
+    """Reads the queue length the TaskThread put into the event payload"""
+    try:
+        return max(1, min(int(args.additionalInfo), MAX_TASKS_PER_TICK))
+    except (AttributeError, TypeError, ValueError):
+        return MAX_TASKS_PER_TICK
 
 
 class TaskThread(threading.Thread):
@@ -144,30 +255,127 @@ class TaskThread(threading.Thread):
         self.stopped = event
 
     def run(self):
-        # Alle 200ms Custom Event feuern für Task-Verarbeitung
-        while not self.stopped.wait(0.2):
-            try:
-                app.fireCustomEvent(myCustomEvent, json.dumps({}))
-            except:
-                break
+        # Custom Event nur feuern, wenn Tasks anstehen (kein festes 200ms Polling)
+        fired_at = 0.0
+        interval = MIN_POLL_INTERVAL
+        while not self.stopped.is_set():
+            if task_available.wait(timeout=1.0):
+                if self.stopped.is_set():
+                    break
+                # Solange das letzte Event noch nicht verarbeitet ist (UI beschäftigt),
+                # kein weiteres feuern - notify arbeitet die neuen Tasks mit ab.
+                # Kurz nachfragen, bei länger beschäftigter UI immer seltener
+                if dispatch_pending.is_set() and time.monotonic() - fired_at < DISPATCH_TIMEOUT:
+                    self.stopped.wait(interval)
+                    interval = min(interval * 2, MAX_POLL_INTERVAL)
+                    continue
+                interval = MIN_POLL_INTERVAL
+                task_available.clear()
+                dispatch_pending.set()
+                fired_at = time.monotonic()
+                try:
+                    # Anzahl wartender Tasks als Payload, notify muss die Queue nicht abfragen
+                    app.fireCustomEvent(myCustomEvent, _BATCH_PAYLOADS[min(task_queue.qsize(), MAX_TASKS_PER_TICK)])
+                except:
+                    break
 
 
 
 ###Geometry Functions######
 
+# Häufig genutzte API-Funktionen einmal auflösen (für Schleifen über viele Punkte)
+create_point = adsk.core.Point3D.create
+NEW_BODY = adsk.fusion.FeatureOperations.NewBodyFeatureOperation
+
+def error_details():
+    """
+    Text of the exception currently being handled for the error message box.
+    The full traceback is only formatted in DEBUG mode
+    """
+    if DEBUG:
+        return traceback.format_exc()
+    return repr(sys.exc_info()[1])
+
+def export_directory(Name):
+    """
+    Export folder for Name, created only if it does not exist yet
+    """
+    path = os.path.join(EXPORT_ROOT, Name)
+    if not os.path.isdir(path):
+        os.makedirs(path, exist_ok=True)
+    return path
+
+_offset_planes = {}  # (Plane, offset) -> ConstructionPlane, gilt nur für das Design aus run()
+
+def offset_plane(rootComp, plane, offset):
+    """
+    Returns a construction plane offset from the base plane.
+    A plane created earlier for the same offset is reused as long as it still exists,
+    so drawing many shapes at the same height does not add a plane for each of them
+    """
+    # Gerundet, damit z.B. 0.1+0.2 und 0.3 dieselbe Ebene treffen
+    key = (plane, round(offset, 9))
+    offsetPlane = _offset_planes.get(key)
+    if offsetPlane is None or not offsetPlane.isValid:
+        planes = rootComp.constructionPlanes
+        planeInput = planes.createInput()
+        planeInput.setByOffset(construction_plane(rootComp, plane), adsk.core.ValueInput.createByReal(offset))
+        offsetPlane = planes.add(planeInput)
+        _offset_planes[key] = offsetPlane
+    return offsetPlane
+
+_constant_values = {}  # Wert -> ValueInput, für feste Winkel wie 2*pi oder '360 deg'
+
+def constant_value(value):
+    """
+    Returns a cached ValueInput for a constant value.
+    Strings are created as expressions, numbers as real values
+    """
+    valueInput = _constant_values.get(value)
+    if valueInput is None:
+        if isinstance(value, str):
+            valueInput = adsk.core.ValueInput.createByString(value)
+        else:
+            valueInput = adsk.core.ValueInput.createByReal(value)
+        _constant_values[value] = valueInput
+    return valueInput
+
+@contextlib.contextmanager
+def deferred_compute(sketch):
+    """
+    Suspends the sketch solve while many entities are added,
+    the sketch is computed once when the block is left
+    """
+    sketch.isComputeDeferred = True
+    try:
+        yield sketch
+    finally:
+        sketch.isComputeDeferred = False
+
+def add_closed_polyline(sketchLines, points):
+    """
+    Draws lines between consecutive Point3D objects and closes the shape.
+    Every point is created once and shared by the two lines that meet there
+    """
+    addLine = sketchLines.addByTwoPoints
+    for start, end in zip(points, points[1:] + points[:1]):
+        addLine(start, end)
+
+def construction_plane(rootComp, plane):
+    """Returns the construction plane of rootComp for a Plane value"""
+    return getattr(rootComp, PLANE_ATTRIBUTES[plane])
+
+def construction_axis(rootComp, axis):
+    """Returns the construction axis of rootComp for an Axis value"""
+    return getattr(rootComp, AXIS_ATTRIBUTES[axis])
+
 def draw_text(design, ui, text, thickness,
-              x_1, y_1, z_1, x_2, y_2, z_2, extrusion_value,plane="XY"):
+              x_1, y_1, z_1, x_2, y_2, z_2, extrusion_value,plane=Plane.XY):
     
     try:
         rootComp = design.rootComponent
         sketches = rootComp.sketches
-        
-        if plane == "XY":
-            sketch = sketches.add(rootComp.xYConstructionPlane)
-        elif plane == "XZ":
-            sketch = sketches.add(rootComp.xZConstructionPlane)
-        elif plane == "YZ":
-            sketch = sketches.add(rootComp.yZConstructionPlane)
+        sketch = sketches.add(construction_plane(rootComp, plane))
         point_1 = adsk.core.Point3D.create(x_1, y_1, z_1)
         point_2 = adsk.core.Point3D.create(x_2, y_2, z_2)
 
@@ -180,7 +388,7 @@ def draw_text(design, ui, text, thickness,
         sketchtext = texts.add(input)
         extrudes = rootComp.features.extrudeFeatures
         
-        extInput = extrudes.createInput(sketchtext, adsk.fusion.FeatureOperations.NewBodyFeatureOperation)
+        extInput = extrudes.createInput(sketchtext, NEW_BODY)
         distance = adsk.core.ValueInput.createByReal(extrusion_value)
         extInput.setDistanceExtent(False, distance)
         extInput.isSolid = True
@@ -189,11 +397,11 @@ def draw_text(design, ui, text, thickness,
         ext = extrudes.add(extInput)
     except:
         if ui:
-            ui.messageBox('Failed draw_text:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed draw_text:\n{}'.format(error_details()))
 def create_sphere(design, ui, radius, x, y, z):
     try:
         rootComp = design.rootComponent
-        component: adsk.fusion.Component = design.rootComponent
+        component: adsk.fusion.Component = rootComp
         # Create a new sketch on the xy plane.
         sketches = rootComp.sketches
         
@@ -215,7 +423,7 @@ def create_sphere(design, ui, radius, x, y, z):
         revolves = component.features.revolveFeatures
         revInput = revolves.createInput(profile, axisLine, adsk.fusion.FeatureOperations.NewComponentFeatureOperation)
         # Define that the extent is an angle of 2*pi to get a sphere
-        angle = adsk.core.ValueInput.createByReal(2*math.pi)
+        angle = constant_value(2*math.pi)
         revInput.setAngleExtent(False, angle)
         # Create the extrusion.
         ext = revolves.add(revInput)
@@ -223,13 +431,13 @@ def create_sphere(design, ui, radius, x, y, z):
         
     except:
         if ui :
-            ui.messageBox('Failed create_sphere:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed create_sphere:\n{}'.format(error_details()))
 
 
 
 
 
-def draw_Box(design, ui, height, width, depth,x,y,z, plane=None):
+def draw_Box(design, ui, height, width, depth,x,y,z, plane=Plane.XY):
     """
     Draws Box with given dimensions height, width, depth at position (x,y,z)
     z creates an offset construction plane
@@ -237,25 +445,12 @@ def draw_Box(design, ui, height, width, depth,x,y,z, plane=None):
     try:
         rootComp = design.rootComponent
         sketches = rootComp.sketches
-        planes = rootComp.constructionPlanes
-        
-        # Choose base plane based on parameter
-        if plane == 'XZ':
-            basePlane = rootComp.xZConstructionPlane
-        elif plane == 'YZ':
-            basePlane = rootComp.yZConstructionPlane
-        else:
-            basePlane = rootComp.xYConstructionPlane
         
-        # Create offset plane at z if z != 0
+        # Offset plane at z if z != 0, otherwise the base plane
         if z != 0:
-            planeInput = planes.createInput()
-            offsetValue = adsk.core.ValueInput.createByReal(z)
-            planeInput.setByOffset(basePlane, offsetValue)
-            offsetPlane = planes.add(planeInput)
-            sketch = sketches.add(offsetPlane)
+            sketch = sketches.add(offset_plane(rootComp, plane, z))
         else:
-            sketch = sketches.add(basePlane)
+            sketch = sketches.add(construction_plane(rootComp, plane))
         
         lines = sketch.sketchCurves.sketchLines
         # addCenterPointRectangle: (center, corner-relative-to-center)
@@ -265,28 +460,23 @@ def draw_Box(design, ui, height, width, depth,x,y,z, plane=None):
         )
         prof = sketch.profiles.item(0)
         extrudes = rootComp.features.extrudeFeatures
-        extInput = extrudes.createInput(prof, adsk.fusion.FeatureOperations.NewBodyFeatureOperation)
+        extInput = extrudes.createInput(prof, NEW_BODY)
         distance = adsk.core.ValueInput.createByReal(depth)
         extInput.setDistanceExtent(False, distance)
         extrudes.add(extInput)
     except:
         if ui:
-            ui.messageBox('Failed draw_Box:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed draw_Box:\n{}'.format(error_details()))
 
 def draw_ellipis(design,ui,x_center,y_center,z_center,
-                 x_major, y_major,z_major,x_through,y_through,z_through,plane ="XY"):
+                 x_major, y_major,z_major,x_through,y_through,z_through,plane =Plane.XY):
     """
     Draws an ellipse on the specified plane using three points.
     """
     try:
         rootComp = design.rootComponent
         sketches = rootComp.sketches
-        if plane == "XZ":
-            sketch = sketches.add(rootComp.xZConstructionPlane)
-        elif plane == "YZ":
-            sketch = sketches.add(rootComp.yZConstructionPlane)
-        else:
-            sketch = sketches.add(rootComp.xYConstructionPlane)
+        sketch = sketches.add(construction_plane(rootComp, plane))
         # Always define the points and create the ellipse
         # Ensure all arguments are floats (Fusion API is strict)
         centerPoint = adsk.core.Point3D.create(float(x_center), float(y_center), float(z_center))
@@ -296,43 +486,27 @@ def draw_ellipis(design,ui,x_center,y_center,z_center,
         ellipse = sketchEllipse.add(centerPoint, majorAxisPoint, throughPoint)
     except:
         if ui:
-            ui.messageBox('Failed to draw ellipsis:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed to draw ellipsis:\n{}'.format(error_details()))
 
-def draw_2d_rect(design, ui, x_1, y_1, z_1, x_2, y_2, z_2, plane="XY"):
+def draw_2d_rect(design, ui, x_1, y_1, z_1, x_2, y_2, z_2, plane=Plane.XY):
     rootComp = design.rootComponent
     sketches = rootComp.sketches
-    planes = rootComp.constructionPlanes
 
-    if plane == "XZ":
-        baseplane = rootComp.xZConstructionPlane
+    if plane == Plane.XZ:
         if y_1 and y_2 != 0:
-            planeInput = planes.createInput()
-            offsetValue = adsk.core.ValueInput.createByReal(y_1)
-            planeInput.setByOffset(baseplane, offsetValue)
-            offsetPlane = planes.add(planeInput)
-            sketch = sketches.add(offsetPlane)
+            sketch = sketches.add(offset_plane(rootComp, Plane.XZ, y_1))
         else:
-            sketch = sketches.add(baseplane)
-    elif plane == "YZ":
-        baseplane = rootComp.yZConstructionPlane
+            sketch = sketches.add(rootComp.xZConstructionPlane)
+    elif plane == Plane.YZ:
         if x_1 and x_2 != 0:
-            planeInput = planes.createInput()
-            offsetValue = adsk.core.ValueInput.createByReal(x_1)
-            planeInput.setByOffset(baseplane, offsetValue)
-            offsetPlane = planes.add(planeInput)
-            sketch = sketches.add(offsetPlane)
+            sketch = sketches.add(offset_plane(rootComp, Plane.YZ, x_1))
         else:
-            sketch = sketches.add(baseplane)
+            sketch = sketches.add(rootComp.yZConstructionPlane)
     else:
-        baseplane = rootComp.xYConstructionPlane
         if z_1 and z_2 != 0:
-            planeInput = planes.createInput()
-            offsetValue = adsk.core.ValueInput.createByReal(z_1)
-            planeInput.setByOffset(baseplane, offsetValue)
-            offsetPlane = planes.add(planeInput)
-            sketch = sketches.add(offsetPlane)
+            sketch = sketches.add(offset_plane(rootComp, Plane.XY, z_1))
         else:
-            sketch = sketches.add(baseplane)
+            sketch = sketches.add(rootComp.xYConstructionPlane)
 
     rectangles = sketch.sketchCurves.sketchLines
     point_1 = adsk.core.Point3D.create(x_1, y_1, z_1)
@@ -341,7 +515,7 @@ def draw_2d_rect(design, ui, x_1, y_1, z_1, x_2, y_2, z_2, plane="XY"):
 
 
 
-def draw_circle(design, ui, radius, x, y, z, plane="XY"):
+def draw_circle(design, ui, radius, x, y, z, plane=Plane.XY):
     
     """
     Draws a circle with given radius at position (x,y,z) on the specified plane
@@ -353,31 +527,22 @@ def draw_circle(design, ui, radius, x, y, z, plane="XY"):
     try:
         rootComp = design.rootComponent
         sketches = rootComp.sketches
-        planes = rootComp.constructionPlanes
         
         # Determine which plane and coordinates to use
-        if plane == "XZ":
+        if plane == Plane.XZ:
             basePlane = rootComp.xZConstructionPlane
             # For XZ plane: x and z are in-plane, y is the offset
             if y != 0:
-                planeInput = planes.createInput()
-                offsetValue = adsk.core.ValueInput.createByReal(y)
-                planeInput.setByOffset(basePlane, offsetValue)
-                offsetPlane = planes.add(planeInput)
-                sketch = sketches.add(offsetPlane)
+                sketch = sketches.add(offset_plane(rootComp, Plane.XZ, y))
             else:
                 sketch = sketches.add(basePlane)
             centerPoint = adsk.core.Point3D.create(x, z, 0)
             
-        elif plane == "YZ":
+        elif plane == Plane.YZ:
             basePlane = rootComp.yZConstructionPlane
             # For YZ plane: y and z are in-plane, x is the offset
             if x != 0:
-                planeInput = planes.createInput()
-                offsetValue = adsk.core.ValueInput.createByReal(x)
-                planeInput.setByOffset(basePlane, offsetValue)
-                offsetPlane = planes.add(planeInput)
-                sketch = sketches.add(offsetPlane)
+                sketch = sketches.add(offset_plane(rootComp, Plane.YZ, x))
             else:
                 sketch = sketches.add(basePlane)
             centerPoint = adsk.core.Point3D.create(y, z, 0)
@@ -386,11 +551,7 @@ def draw_circle(design, ui, radius, x, y, z, plane="XY"):
             basePlane = rootComp.xYConstructionPlane
             # For XY plane: x and y are in-plane, z is the offset
             if z != 0:
-                planeInput = planes.createInput()
-                offsetValue = adsk.core.ValueInput.createByReal(z)
-                planeInput.setByOffset(basePlane, offsetValue)
-                offsetPlane = planes.add(planeInput)
-                sketch = sketches.add(offsetPlane)
+                sketch = sketches.add(offset_plane(rootComp, Plane.XY, z))
             else:
                 sketch = sketches.add(basePlane)
             centerPoint = adsk.core.Point3D.create(x, y, 0)
@@ -399,17 +560,19 @@ def draw_circle(design, ui, radius, x, y, z, plane="XY"):
         circles.addByCenterRadius(centerPoint, radius)
     except:
         if ui:
-            ui.messageBox('Failed draw_circle:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed draw_circle:\n{}'.format(error_details()))
 
 
 
 
-def draw_sphere(design, ui, radius, x, y, z):
-    rootComp = design.rootComponent
-    sketches = rootComp.sketches
-    sketch = sketches.add(rootComp.xYConstructionPlane)
-#USELESS  
-
+# Umrisse des Witzenmann-Logos (x, y) bei scaling = 1
+WITZENMANN_OUTLINES = (
+    ((8.283,10.475),(8.283,6.471),(-0.126,6.471),(8.283,2.691),
+     (8.283,-1.235),(-0.496,-1.246),(8.283,-5.715),(8.283,-9.996),
+     (-8.862,-1.247),(-8.859,2.69),(-0.639,2.69),(-8.859,6.409),
+     (-8.859,10.459)),
+    ((-3.391,-5.989),(5.062,-10.141),(-8.859,-10.141),(-8.859,-5.989)),
+)
 
 def draw_Witzenmann(design, ui,scaling,z):
     """
@@ -423,42 +586,24 @@ def draw_Witzenmann(design, ui,scaling,z):
         xyPlane = rootComp.xYConstructionPlane
         sketch = sketches.add(xyPlane)
 
-        points1 = [
-            (8.283*scaling,10.475*scaling,z),(8.283*scaling,6.471*scaling,z),(-0.126*scaling,6.471*scaling,z),(8.283*scaling,2.691*scaling,z),
-            (8.283*scaling,-1.235*scaling,z),(-0.496*scaling,-1.246*scaling,z),(8.283*scaling,-5.715*scaling,z),(8.283*scaling,-9.996*scaling,z),
-            (-8.862*scaling,-1.247*scaling,z),(-8.859*scaling,2.69*scaling,z),(-0.639*scaling,2.69*scaling,z),(-8.859*scaling,6.409*scaling,z),
-            (-8.859*scaling,10.459*scaling,z)
-        ]
-        for i in range(len(points1)-1):
-            start = adsk.core.Point3D.create(points1[i][0], points1[i][1],points1[i][2])
-            end   = adsk.core.Point3D.create(points1[i+1][0], points1[i+1][1],points1[i+1][2])
-            sketch.sketchCurves.sketchLines.addByTwoPoints(start,end) # Verbindungslinie zeichnen
-        sketch.sketchCurves.sketchLines.addByTwoPoints(
-            adsk.core.Point3D.create(points1[-1][0],points1[-1][1],points1[-1][2]),
-            adsk.core.Point3D.create(points1[0][0],points1[0][1],points1[0][2])
-        )
-
-        points2 = [(-3.391*scaling,-5.989*scaling,z),(5.062*scaling,-10.141*scaling,z),(-8.859*scaling,-10.141*scaling,z),(-8.859*scaling,-5.989*scaling,z)]
-        for i in range(len(points2)-1):
-            start = adsk.core.Point3D.create(points2[i][0], points2[i][1],points2[i][2])
-            end   = adsk.core.Point3D.create(points2[i+1][0], points2[i+1][1],points2[i+1][2])
-            sketch.sketchCurves.sketchLines.addByTwoPoints(start,end)
-        sketch.sketchCurves.sketchLines.addByTwoPoints(
-            adsk.core.Point3D.create(points2[-1][0], points2[-1][1],points2[-1][2]),
-            adsk.core.Point3D.create(points2[0][0], points2[0][1],points2[0][2])
-        )
+        sketchLines = sketch.sketchCurves.sketchLines
+        with deferred_compute(sketch):
+            for outline in WITZENMANN_OUTLINES:
+                add_closed_polyline(sketchLines, [create_point(x*scaling, y*scaling, z) for x, y in outline])
 
         extrudes = rootComp.features.extrudeFeatures
         distance = adsk.core.ValueInput.createByReal(2.0*scaling)
-        for i in range(sketch.profiles.count):
-            prof = sketch.profiles.item(i)
-            extrudeInput = extrudes.createInput(prof, adsk.fusion.FeatureOperations.NewBodyFeatureOperation)
-            extrudeInput.setDistanceExtent(False,distance)
-            extrudes.add(extrudeInput)
+        # Alle Profile in einem Extrude-Feature statt einem Feature pro Profil
+        profiles = adsk.core.ObjectCollection.create()
+        for prof in sketch.profiles:
+            profiles.add(prof)
+        extrudeInput = extrudes.createInput(profiles, NEW_BODY)
+        extrudeInput.setDistanceExtent(False,distance)
+        extrudes.add(extrudeInput)
 
     except:
         if ui:
-            ui.messageBox('Failed draw_Witzenmann:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed draw_Witzenmann:\n{}'.format(error_details()))
 ##############################################################################################
 ###2D Geometry Functions######
 
@@ -488,10 +633,10 @@ def move_last_body(design,ui,x,y,z):
         moveFeats.add(moveFeatureInput)
     except:
         if ui:
-            ui.messageBox('Failed to move the body:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed to move the body:\n{}'.format(error_details()))
 
 
-def offsetplane(design,ui,offset,plane ="XY"):
+def offsetplane(design,ui,offset,plane =Plane.XY):
 
     """,
     Creates a new offset sketch which can be selected
@@ -502,17 +647,11 @@ def offsetplane(design,ui,offset,plane ="XY"):
         offset = adsk.core.ValueInput.createByReal(offset)
         ctorPlanes = rootComp.constructionPlanes
         ctorPlaneInput1 = ctorPlanes.createInput()
-        
-        if plane == "XY":         
-            ctorPlaneInput1.setByOffset(rootComp.xYConstructionPlane, offset)
-        elif plane == "XZ":
-            ctorPlaneInput1.setByOffset(rootComp.xZConstructionPlane, offset)
-        elif plane == "YZ":
-            ctorPlaneInput1.setByOffset(rootComp.yZConstructionPlane, offset)
+        ctorPlaneInput1.setByOffset(construction_plane(rootComp, plane), offset)
         ctorPlanes.add(ctorPlaneInput1)
     except:
         if ui:
-            ui.messageBox('Failed offsetplane:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed offsetplane:\n{}'.format(error_details()))
 
 
 
@@ -575,7 +714,7 @@ def create_thread(design, ui,inside,sizes):
         
     except: 
         if ui:
-            ui.messageBox('Failed offsetplane thread:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed offsetplane thread:\n{}'.format(error_details()))
 
 
 
@@ -583,7 +722,7 @@ def create_thread(design, ui,inside,sizes):
 
 
 
-def spline(design, ui, points, plane="XY"):
+def spline(design, ui, points, plane=Plane.XY):
     """
     Draws a spline through the given points on the specified plane
     Plane can be "XY", "XZ", or "YZ"
@@ -591,21 +730,17 @@ def spline(design, ui, points, plane="XY"):
     try:
         rootComp = design.rootComponent
         sketches = rootComp.sketches
-        if plane == "XY":
-            sketch = sketches.add(rootComp.xYConstructionPlane)
-        elif plane == "XZ":
-            sketch = sketches.add(rootComp.xZConstructionPlane)
-        elif plane == "YZ":
-            sketch = sketches.add(rootComp.yZConstructionPlane)
+        sketch = sketches.add(construction_plane(rootComp, plane))
         
         splinePoints = adsk.core.ObjectCollection.create()
-        for point in points:
-            splinePoints.add(adsk.core.Point3D.create(point[0], point[1], point[2]))
+        add = splinePoints.add
+        for x, y, z in points:
+            add(create_point(x, y, z))
         
         sketch.sketchCurves.sketchFittedSplines.add(splinePoints)
     except:
         if ui:
-            ui.messageBox('Failed draw_spline:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed draw_spline:\n{}'.format(error_details()))
 
 
 
@@ -618,67 +753,50 @@ def arc(design,ui,point1,point2,points3,plane = "XY",connect = False):
     try:
         rootComp = design.rootComponent #Holen der Rotkomponente
         sketches = rootComp.sketches
-        xyPlane = rootComp.xYConstructionPlane 
         if plane == "XZ":
             sketch = sketches.add(rootComp.xZConstructionPlane)
         elif plane == "YZ":
             sketch = sketches.add(rootComp.yZConstructionPlane)
         else:
-            xyPlane = rootComp.xYConstructionPlane 
-
-            sketch = sketches.add(xyPlane)
+            sketch = sketches.add(rootComp.xYConstructionPlane)
         start  = adsk.core.Point3D.create(point1[0],point1[1],point1[2])
         alongpoint    = adsk.core.Point3D.create(point2[0],point2[1],point2[2])
         endpoint =adsk.core.Point3D.create(points3[0],points3[1],points3[2])
         arcs = sketch.sketchCurves.sketchArcs
         arc = arcs.addByThreePoints(start, alongpoint, endpoint)
         if connect:
-            startconnect = adsk.core.Point3D.create(start.x, start.y, start.z)
-            endconnect = adsk.core.Point3D.create(endpoint.x, endpoint.y, endpoint.z)
-            lines = sketch.sketchCurves.sketchLines
-            lines.addByTwoPoints(startconnect, endconnect)
-            connect = False
-        else:
-            lines = sketch.sketchCurves.sketchLines
+            # Sehne zwischen Start- und Endpunkt
+            sketch.sketchCurves.sketchLines.addByTwoPoints(start, endpoint)
 
     except:
         if ui:
-            ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed:\n{}'.format(error_details()))
 
 
-def draw_lines(design,ui, points,Plane = "XY"):
+def draw_lines(design,ui, points,plane = Plane.XY):
     """
     User input: points = [(x1,y1), (x2,y2), ...]
     Plane: "XY", "XZ", "YZ"
     Draws lines between the given points on the specified plane
     Connects the last point to the first point to close the shape
     """
+    if len(points) < 2:
+        # Keine Linie möglich: kein leerer Sketch, addByTwoPoints(p, p) würde fehlschlagen
+        return
     try:
         rootComp = design.rootComponent #Holen der Rotkomponente
         sketches = rootComp.sketches
-        if Plane == "XY":
-            xyPlane = rootComp.xYConstructionPlane 
-            sketch = sketches.add(xyPlane)
-        elif Plane == "XZ":
-            xZPlane = rootComp.xZConstructionPlane
-            sketch = sketches.add(xZPlane)
-        elif Plane == "YZ":
-            yZPlane = rootComp.yZConstructionPlane
-            sketch = sketches.add(yZPlane)
-        for i in range(len(points)-1):
-            start = adsk.core.Point3D.create(points[i][0], points[i][1], 0)
-            end   = adsk.core.Point3D.create(points[i+1][0], points[i+1][1], 0)
-            sketch.sketchCurves.sketchLines.addByTwoPoints(start, end)
-        sketch.sketchCurves.sketchLines.addByTwoPoints(
-            adsk.core.Point3D.create(points[-1][0],points[-1][1],0),
-            adsk.core.Point3D.create(points[0][0],points[0][1],0) #
-        ) # Verbindet den ersten und letzten Punkt
+        sketch = sketches.add(construction_plane(rootComp, plane))
+        # Verbindet auch den letzten mit dem ersten Punkt
+        with deferred_compute(sketch):
+            add_closed_polyline(sketch.sketchCurves.sketchLines,
+                                [create_point(point[0], point[1], 0) for point in points])
 
     except:
         if ui :
-            ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed:\n{}'.format(error_details()))
 
-def draw_one_line(design, ui, x1, y1, z1, x2, y2, z2, plane="XY"):
+def draw_one_line(design, ui, x1, y1, z1, x2, y2, z2, plane=Plane.XY):
     """
     Draws a single line between two points (x1, y1, z1) and (x2, y2, z2) on the specified plane
     Plane can be "XY", "XZ", or "YZ"
@@ -696,7 +814,7 @@ def draw_one_line(design, ui, x1, y1, z1, x2, y2, z2, plane="XY"):
         sketch.sketchCurves.sketchLines.addByTwoPoints(start, end)
     except:
         if ui:
-            ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed:\n{}'.format(error_details()))
 
 
 
@@ -714,14 +832,14 @@ def loft(design, ui, sketchcount):
         sketches = rootComp.sketches
         loftFeatures = rootComp.features.loftFeatures
         
-        loftInput = loftFeatures.createInput(adsk.fusion.FeatureOperations.NewBodyFeatureOperation)
+        loftInput = loftFeatures.createInput(NEW_BODY)
         loftSectionsObj = loftInput.loftSections
         
         # Add profiles from the last 'sketchcount' sketches
+        last = sketches.count - 1
+        addSection = loftSectionsObj.add
         for i in range(sketchcount):
-            sketch = sketches.item(sketches.count - 1 - i)
-            profile = sketch.profiles.item(0)
-            loftSectionsObj.add(profile)
+            addSection(sketches.item(last - i).profiles.item(0))
         
         loftInput.isSolid = True
         loftInput.isClosed = False
@@ -732,7 +850,7 @@ def loft(design, ui, sketchcount):
         
     except:
         if ui:
-            ui.messageBox('Failed loft:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed loft:\n{}'.format(error_details()))
 
 
 
@@ -763,17 +881,12 @@ def boolean_operation(design,ui,op):
         input: adsk.fusion.CombineFeatureInput = combineFeatures.createInput(targetBody, tools)
         input.isNewComponent = False
         input.isKeepToolBodies = False
-        if op == "cut":
-            input.operation = adsk.fusion.FeatureOperations.CutFeatureOperation
-        elif op == "intersect":
-            input.operation = adsk.fusion.FeatureOperations.IntersectFeatureOperation
-        elif op == "join":
-            input.operation = adsk.fusion.FeatureOperations.JoinFeatureOperation
+        input.operation = BOOLEAN_OPERATIONS[op]
             
         combineFeature = combineFeatures.add(input)
     except:
         if ui:
-            ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed:\n{}'.format(error_details()))
 
 
 
@@ -785,17 +898,19 @@ def sweep(design,ui):
         sketches = rootComp.sketches
         sweeps = rootComp.features.sweepFeatures
 
-        profsketch = sketches.item(sketches.count - 2)  # Letzter Sketch
+        count = sketches.count
+        profsketch = sketches.item(count - 2)  # Letzter Sketch
         prof = profsketch.profiles.item(0) # Letztes Profil im Sketch also der Kreis
-        pathsketch = sketches.item(sketches.count - 1) # take the last sketch as path
+        pathsketch = sketches.item(count - 1) # take the last sketch as path
         # collect all sketch curves in an ObjectCollection
         pathCurves = adsk.core.ObjectCollection.create()
-        for i in range(pathsketch.sketchCurves.count):
-            pathCurves.add(pathsketch.sketchCurves.item(i))
+        add = pathCurves.add
+        for curve in pathsketch.sketchCurves:
+            add(curve)
 
     
         path = adsk.fusion.Path.create(pathCurves, 0) # connec
-        sweepInput = sweeps.createInput(prof, path, adsk.fusion.FeatureOperations.NewBodyFeatureOperation)
+        sweepInput = sweeps.createInput(prof, path, NEW_BODY)
         sweeps.add(sweepInput)
 
 
@@ -809,7 +924,7 @@ def extrude_last_sketch(design, ui, value,taperangle):
         sketch = sketches.item(sketches.count - 1)  # Letzter Sketch
         prof = sketch.profiles.item(0)  # Erstes Profil im Sketch
         extrudes = rootComp.features.extrudeFeatures
-        extrudeInput = extrudes.createInput(prof, adsk.fusion.FeatureOperations.NewBodyFeatureOperation)
+        extrudeInput = extrudes.createInput(prof, NEW_BODY)
         distance = adsk.core.ValueInput.createByReal(value)
         
         if taperangle != 0:
@@ -823,7 +938,7 @@ def extrude_last_sketch(design, ui, value,taperangle):
         extrudes.add(extrudeInput)
     except:
         if ui:
-            ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed:\n{}'.format(error_details()))
 
 def shell_existing_body(design, ui, thickness=0.5, faceindex=0):
     """
@@ -851,7 +966,7 @@ def shell_existing_body(design, ui, thickness=0.5, faceindex=0):
 
     except:
         if ui:
-            ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed:\n{}'.format(error_details()))
 
 
 def fillet_edges(design, ui, radius=0.3):
@@ -861,11 +976,10 @@ def fillet_edges(design, ui, radius=0.3):
         bodies = rootComp.bRepBodies
 
         edgeCollection = adsk.core.ObjectCollection.create()
-        for body_idx in range(bodies.count):
-            body = bodies.item(body_idx)
-            for edge_idx in range(body.edges.count):
-                edge = body.edges.item(edge_idx)
-                edgeCollection.add(edge)
+        add = edgeCollection.add
+        for body in bodies:
+            for edge in body.edges:
+                add(edge)
 
         fillets = rootComp.features.filletFeatures
         radiusInput = adsk.core.ValueInput.createByReal(radius)
@@ -877,7 +991,7 @@ def fillet_edges(design, ui, radius=0.3):
 
     except:
         if ui:
-            ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed:\n{}'.format(error_details()))
 def revolve_profile(design, ui,  angle=360):
     """
     This function revolves already existing sketch with drawn lines from the function draw_lines
@@ -899,12 +1013,12 @@ def revolve_profile(design, ui,  angle=360):
 
     except:
         if ui:
-            ui.messageBox('Failed revolve_profile:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed revolve_profile:\n{}'.format(error_details()))
 
 ##############################################################################################
 
 ###Selection Functions######
-def rect_pattern(design,ui,axis_one ,axis_two ,quantity_one,quantity_two,distance_one,distance_two,plane="XY"):
+def rect_pattern(design,ui,axis_one ,axis_two ,quantity_one,quantity_two,distance_one,distance_two,plane=Plane.XY):
     """
     Creates a rectangular pattern of the last body along the specified axis and plane
     There are two quantity parameters for two directions
@@ -924,34 +1038,23 @@ def rect_pattern(design,ui,axis_one ,axis_two ,quantity_one,quantity_two,distanc
 
 
 
-        quantity_one = adsk.core.ValueInput.createByString(f"{quantity_one}")
-        quantity_two = adsk.core.ValueInput.createByString(f"{quantity_two}")
-        distance_one = adsk.core.ValueInput.createByString(f"{distance_one}")
-        distance_two = adsk.core.ValueInput.createByString(f"{distance_two}")
+        # Anzahl ist einheitenlos -> createByReal ohne Expression-Parser.
+        # Abstände bleiben Expressions, da sie in Dokumenteinheiten (mm) interpretiert werden
+        quantity_one = adsk.core.ValueInput.createByReal(quantity_one)
+        quantity_two = adsk.core.ValueInput.createByReal(quantity_two)
+        distance_one = adsk.core.ValueInput.createByString(str(distance_one))
+        distance_two = adsk.core.ValueInput.createByString(str(distance_two))
 
         bodies = rootComp.bRepBodies
-        if bodies.count > 0:
-            latest_body = bodies.item(bodies.count - 1)
-        else:
+        count = bodies.count
+        if count == 0:
             ui.messageBox("Keine Bodies gefunden.")
+            return
+        latest_body = bodies.item(count - 1)
         inputEntites = adsk.core.ObjectCollection.create()
         inputEntites.add(latest_body)
-        baseaxis_one = None    
-        if axis_one == "Y":
-            baseaxis_one = rootComp.yConstructionAxis 
-        elif axis_one == "X":
-            baseaxis_one = rootComp.xConstructionAxis
-        elif axis_one == "Z":
-            baseaxis_one = rootComp.zConstructionAxis
-
-
-        baseaxis_two = None    
-        if axis_two == "Y":
-            baseaxis_two = rootComp.yConstructionAxis  
-        elif axis_two == "X":
-            baseaxis_two = rootComp.xConstructionAxis
-        elif axis_two == "Z":
-            baseaxis_two = rootComp.zConstructionAxis
+        baseaxis_one = construction_axis(rootComp, axis_one)
+        baseaxis_two = construction_axis(rootComp, axis_two)
 
  
 
@@ -961,7 +1064,7 @@ def rect_pattern(design,ui,axis_one ,axis_two ,quantity_one,quantity_two,distanc
         rectangularFeature = rectFeats.add(rectangularPatternInput)
     except:
         if ui:
-            ui.messageBox('Failed to execute rectangular pattern:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed to execute rectangular pattern:\n{}'.format(error_details()))
         
         
 
@@ -972,31 +1075,18 @@ def circular_pattern(design, ui, quantity, axis, plane):
         circularFeats = rootComp.features.circularPatternFeatures
         bodies = rootComp.bRepBodies
 
-        if bodies.count > 0:
-            latest_body = bodies.item(bodies.count - 1)
-        else:
+        count = bodies.count
+        if count == 0:
             ui.messageBox("Keine Bodies gefunden.")
+            return
+        latest_body = bodies.item(count - 1)
         inputEntites = adsk.core.ObjectCollection.create()
         inputEntites.add(latest_body)
-        if plane == "XY":
-            sketch = sketches.add(rootComp.xYConstructionPlane)
-        elif plane == "XZ":
-            sketch = sketches.add(rootComp.xZConstructionPlane)    
-        elif plane == "YZ":
-            sketch = sketches.add(rootComp.yZConstructionPlane)
-        
-        if axis == "Y":
-            yAxis = rootComp.yConstructionAxis
-            circularFeatInput = circularFeats.createInput(inputEntites, yAxis)
-        elif axis == "X":
-            xAxis = rootComp.xConstructionAxis
-            circularFeatInput = circularFeats.createInput(inputEntites, xAxis)
-        elif axis == "Z":
-            zAxis = rootComp.zConstructionAxis
-            circularFeatInput = circularFeats.createInput(inputEntites, zAxis)
+        sketch = sketches.add(construction_plane(rootComp, plane))
+        circularFeatInput = circularFeats.createInput(inputEntites, construction_axis(rootComp, axis))
 
         circularFeatInput.quantity = adsk.core.ValueInput.createByReal((quantity))
-        circularFeatInput.totalAngle = adsk.core.ValueInput.createByString('360 deg')
+        circularFeatInput.totalAngle = constant_value('360 deg')
         circularFeatInput.isSymmetric = False
         circularFeats.add(circularFeatInput)
         
@@ -1004,7 +1094,7 @@ def circular_pattern(design, ui, quantity, axis, plane):
 
     except:
         if ui:
-            ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed:\n{}'.format(error_details()))
 
 
 
@@ -1019,7 +1109,7 @@ def undo(design, ui):
 
     except:
         if ui:
-            ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed:\n{}'.format(error_details()))
 
 
 def delete(design,ui):
@@ -1032,15 +1122,16 @@ def delete(design,ui):
         bodies = rootComp.bRepBodies
         removeFeat = rootComp.features.removeFeatures
 
-        # Von hinten nach vorne löschen
-        for i in range(bodies.count - 1, -1, -1): # startet bei bodies.count - 1 und geht in Schritten von -1 bis 0 
-            body = bodies.item(i)
-            removeFeat.add(body)
+        # RemoveFeatures.add nimmt nur einzelne Bodies, daher erst eine Kopie der
+        # Liste ziehen, damit das Löschen nicht die laufende Iteration verschiebt
+        add = removeFeat.add
+        for body in list(bodies):
+            add(body)
 
         
     except:
         if ui:
-            ui.messageBox('Failed to delete:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed to delete:\n{}'.format(error_details()))
 
 
 
@@ -1049,10 +1140,7 @@ def export_as_STEP(design, ui,Name):
         
         exportMgr = design.exportManager
               
-        directory_name = "Fusion_Exports"
-        FilePath = os.path.join(os.path.join(os.environ['USERPROFILE']), 'Desktop') 
-        Export_dir_path = os.path.join(FilePath, directory_name, Name)
-        os.makedirs(Export_dir_path, exist_ok=True) 
+        Export_dir_path = export_directory(Name)
         
         stepOptions = exportMgr.createSTEPExportOptions(Export_dir_path+ f'/{Name}.step')  # Save as Fusion.step in the export directory
        # stepOptions = exportMgr.createSTEPExportOptions(Export_dir_path)       
@@ -1065,7 +1153,7 @@ def export_as_STEP(design, ui,Name):
             ui.messageBox("STEP export failed")
     except:
         if ui:
-            ui.messageBox('Failed export_as_STEP:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed export_as_STEP:\n{}'.format(error_details()))
 
 def cut_extrude(design,ui,depth):
     try:
@@ -1080,7 +1168,7 @@ def cut_extrude(design,ui,depth):
         extrudes.add(extrudeInput)
     except:
         if ui:
-            ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed:\n{}'.format(error_details()))
 
 
 def extrude_thin(design, ui, thickness,distance):
@@ -1091,7 +1179,7 @@ def extrude_thin(design, ui, thickness,distance):
     #selectedFace = ui.selectEntity('Select a face for the extrusion.', 'Profiles').entity
     selectedFace = sketches.item(sketches.count - 1).profiles.item(0)
     exts = rootComp.features.extrudeFeatures
-    extInput = exts.createInput(selectedFace, adsk.fusion.FeatureOperations.NewBodyFeatureOperation)
+    extInput = exts.createInput(selectedFace, NEW_BODY)
     extInput.setThinExtrude(adsk.fusion.ThinExtrudeWallLocation.Center,
                             adsk.core.ValueInput.createByReal(thickness))
 
@@ -1101,34 +1189,28 @@ def extrude_thin(design, ui, thickness,distance):
     ext = exts.add(extInput)
 
 
-def draw_cylinder(design, ui, radius, height, x,y,z,plane = "XY"):
+def draw_cylinder(design, ui, radius, height, x,y,z,plane = Plane.XY):
     """
     Draws a cylinder with given radius and height at position (x,y,z)
     """
     try:
         rootComp = design.rootComponent
         sketches = rootComp.sketches
-        xyPlane = rootComp.xYConstructionPlane
-        if plane == "XZ":
-            sketch = sketches.add(rootComp.xZConstructionPlane)
-        elif plane == "YZ":
-            sketch = sketches.add(rootComp.yZConstructionPlane)
-        else:
-            sketch = sketches.add(xyPlane)
+        sketch = sketches.add(construction_plane(rootComp, plane))
 
         center = adsk.core.Point3D.create(x, y, z)
         sketch.sketchCurves.sketchCircles.addByCenterRadius(center, radius)
 
         prof = sketch.profiles.item(0)
         extrudes = rootComp.features.extrudeFeatures
-        extInput = extrudes.createInput(prof, adsk.fusion.FeatureOperations.NewBodyFeatureOperation)
+        extInput = extrudes.createInput(prof, NEW_BODY)
         distance = adsk.core.ValueInput.createByReal(height)
         extInput.setDistanceExtent(False, distance)
         extrudes.add(extInput)
 
     except:
         if ui:
-            ui.messageBox('Failed draw_cylinder:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed draw_cylinder:\n{}'.format(error_details()))
 
 
 
@@ -1146,16 +1228,13 @@ def export_as_STL(design, ui,Name):
 
         stlRootOptions = exportMgr.createSTLExportOptions(rootComp)
         
-        directory_name = "Fusion_Exports"
-        FilePath = os.path.join(os.path.join(os.environ['USERPROFILE']), 'Desktop') 
-        Export_dir_path = os.path.join(FilePath, directory_name, Name)
-        os.makedirs(Export_dir_path, exist_ok=True) 
+        Export_dir_path = export_directory(Name)
 
         printUtils = stlRootOptions.availablePrintUtilities
 
         # export the root component to the print utility, instead of a specified file            
+        stlRootOptions.sendToPrintUtility = True
         for printUtil in printUtils:
-            stlRootOptions.sendToPrintUtility = True
             stlRootOptions.printUtility = printUtil
 
             exportMgr.execute(stlRootOptions)
@@ -1174,9 +1253,11 @@ def export_as_STL(design, ui,Name):
             exportMgr.execute(stlExportOptions)
 
         # export the body one by one in the design to a specified file
+        # (alle Bodies gehören zur Root-Komponente -> Präfix nur einmal bilden)
         allBodies = rootComp.bRepBodies
+        bodyPrefix = Export_dir_path + "/" + rootComp.name + '-'
         for body in allBodies:
-            Name = Export_dir_path + "/" + body.parentComponent.name + '-' + body.name 
+            Name = bodyPrefix + body.name 
             
             # create stl exportOptions
             stlExportOptions = exportMgr.createSTLExportOptions(body, Name)
@@ -1187,32 +1268,80 @@ def export_as_STL(design, ui,Name):
         ui.messageBox(f"Exported STL to: {Export_dir_path}")
     except:
         if ui:
-            ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed:\n{}'.format(error_details()))
 
 def get_model_parameters(design):
+    """
+    Collects the raw model parameters on the UI thread (Fusion API is not thread-safe).
+    Formatting for the HTTP response happens in format_model_parameters on the HTTP thread
+    """
     model_params = []
-    user_params = design.userParameters
+    # Parameternamen sind im Design eindeutig -> ein Set statt Vergleich mit jedem User-Parameter
+    user_names = {param.name for param in design.userParameters}
     for param in design.allParameters:
-        if all(user_params.item(i) != param for i in range(user_params.count)):
-            try:
-                wert = str(param.value)
-            except Exception:
-                wert = ""
-            model_params.append({
-                "Name": str(param.name),
-                "Wert": wert,
-                "Einheit": str(param.unit),
-                "Expression": str(param.expression) if param.expression else ""
-            })
+        name = param.name
+        if name in user_names:
+            continue
+        try:
+            wert = param.value
+        except Exception:
+            wert = ""
+        model_params.append((name, wert, param.unit, param.expression))
     return model_params
 
+def parameter_revision(design):
+    """
+    Cheap marker of the model state: parameter count and timeline position.
+    Changes when features are added, deleted, undone or rolled back, also from the Fusion UI
+    """
+    count = design.allParameters.count
+    try:
+        timeline = design.timeline
+        return (count, timeline.count, timeline.markerPosition)
+    except Exception:
+        # Direct Design hat keine Timeline
+        return (count,)
+
+def refresh_parameters(design, result):
+    """
+    Rebuilds the parameter snapshot on the UI thread if a task changed the model
+    or the revision differs from the one of the cached snapshot.
+    Queued by current_parameters, result is the Future all waiting GETs share
+    """
+    global ModelParameterSnapshot, _param_dirty, _param_cache_version, _param_checked, _pending_refresh
+    try:
+        revision = parameter_revision(design)
+        if _param_dirty or revision != _param_cache_version:
+            ModelParameterSnapshot = get_model_parameters(design)
+            _param_cache_version = revision
+            _param_dirty = False
+        _param_checked = time.monotonic()
+    except Exception as e:
+        result.set_exception(e)
+    else:
+        result.set_result(ModelParameterSnapshot)
+    finally:
+        # Der nächste GET queued wieder einen eigenen Refresh
+        with _refresh_lock:
+            if _pending_refresh is result:
+                _pending_refresh = None
+
+def format_model_parameters(snapshot):
+    """Converts the raw snapshot of get_model_parameters into JSON-ready dicts"""
+    return [{
+        "Name": str(name),
+        "Wert": str(wert),
+        "Einheit": str(unit),
+        "Expression": str(expression) if expression else ""
+    } for name, wert, unit, expression in snapshot]
+
 def set_parameter(design, ui, name, value):
     try:
         param = design.allParameters.itemByName(name)
         param.expression = value
     except:
         if ui:
-            ui.messageBox('Failed set_parameter:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed set_parameter:\n{}'.format(error_details()))
 
 def holes(design, ui, points, width=1.0,distance = 1.0,faceindex=0):
     """
@@ -1223,37 +1352,36 @@ def holes(design, ui, points, width=1.0,distance = 1.0,faceindex=0):
         rootComp = design.rootComponent
         holes = rootComp.features.holeFeatures
         sketches = rootComp.sketches
-        
-        
-        rootComp = design.rootComponent
         bodies = rootComp.bRepBodies
 
-        if bodies.count > 0:
-            latest_body = bodies.item(bodies.count - 1)
-        else:
+        count = bodies.count
+        if count == 0:
             ui.messageBox("Keine Bodies gefunden.")
             return
-        entities = adsk.core.ObjectCollection.create()
-        entities.add(latest_body.faces.item(faceindex))
-        sk = sketches.add(latest_body.faces.item(faceindex))# create sketch on faceindex face
-
-        tipangle = 90.0
-        for i in range(len(points)):
-            holePoint = sk.sketchPoints.add(adsk.core.Point3D.create(points[i][0], points[i][1], 0))
-            tipangle = adsk.core.ValueInput.createByString('180 deg')
-            holedistance = adsk.core.ValueInput.createByReal(distance)
-        
-            holeDiam = adsk.core.ValueInput.createByReal(width)
-            holeInput = holes.createSimpleInput(holeDiam)
-            holeInput.tipAngle = tipangle
-            holeInput.setPositionBySketchPoint(holePoint)
-            holeInput.setDistanceExtent(holedistance)
-
-        # Add the hole
-            holes.add(holeInput)
+        if not points:
+            # Ohne Positionen kein Hole-Feature (leere Collection wird abgelehnt) und kein leerer Sketch
+            return
+        latest_body = bodies.item(count - 1)
+        face = latest_body.faces.item(faceindex)
+        sk = sketches.add(face)# create sketch on faceindex face
+
+        # Alle Lochpositionen sammeln, dann ein einziges Hole-Feature für alle Punkte
+        holePoints = adsk.core.ObjectCollection.create()
+        addSketchPoint = sk.sketchPoints.add
+        with deferred_compute(sk):
+            for point in points:
+                holePoints.add(addSketchPoint(create_point(point[0], point[1], 0)))
+
+        holeInput = holes.createSimpleInput(adsk.core.ValueInput.createByReal(width))
+        holeInput.tipAngle = constant_value('180 deg')
+        holeInput.setPositionBySketchPoints(holePoints)
+        holeInput.setDistanceExtent(adsk.core.ValueInput.createByReal(distance))
+
+        # Add the holes
+        holes.add(holeInput)
     except Exception:
         if ui:
-            ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed:\n{}'.format(error_details()))
 
 
 
@@ -1268,7 +1396,7 @@ def select_body(design,ui,Bodyname):
 
     except : 
         if ui :
-            ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed:\n{}'.format(error_details()))
 
 def select_sketch(design,ui,Sketchname):
     try: 
@@ -1281,419 +1409,507 @@ def select_sketch(design,ui,Sketchname):
 
     except : 
         if ui :
-            ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+            ui.messageBox('Failed:\n{}'.format(error_details()))
 
 
 # HTTP Server######
+def _raw(value):
+    """Passes the JSON value through unchanged"""
+    return value
+
+def _optional_float(value):
+    return float(value) if value is not None else None
+
+def _plane(value):
+    """'XY', 'XZ', 'YZ' -> Plane, unknown values and None fall back to XY"""
+    return PLANES.get(str(value).upper(), Plane.XY)
+
+def _axis(value):
+    """'X', 'Y', 'Z' -> Axis"""
+    try:
+        return AXES[str(value).upper()]
+    except KeyError:
+        raise ValueError(f"Unknown axis: {value}")
+
+def _bool_op(value):
+    """'join', 'cut', 'intersect' -> BoolOp"""
+    try:
+        return BOOL_OPS[str(value).lower()]
+    except KeyError:
+        raise ValueError(f"Unknown boolean operation: {value}")
+
+PLANES = {plane.name: plane for plane in Plane}
+AXES = {axis.name: axis for axis in Axis}
+BOOL_OPS = {op.name.lower(): op for op in BoolOp}
+
+def _points(value):
+    """
+    Converts a JSON point list into tuples of floats once on the HTTP thread,
+    so the geometry functions on the UI thread get ready-to-use coordinates
+    """
+    return [tuple(map(float, point)) for point in value]
+
+# POST Routen: path -> (task name, [(JSON key, Konvertierung, default), ...], Antwort)
+# Die Argumente werden in dieser Reihenfolge an die Task übergeben
+POST_ROUTES = {
+    '/undo': ('undo', (), "Undo wird ausgeführt"),
+    '/Box': ('draw_box', (
+        ('height', float, 5), ('width', float, 5), ('depth', float, 5),
+        ('x', float, 0), ('y', float, 0), ('z', float, 0),
+        ('plane', _plane, None),  # 'XY', 'XZ', 'YZ' or None
+    ), "Box wird erstellt"),
+    '/Witzenmann': ('draw_witzenmann', (
+        ('scale', _raw, 1.0), ('z', float, 0),
+    ), "Witzenmann-Logo wird erstellt"),
+    '/Export_STL': ('export_stl', (('Name', str, 'Test.stl'),), "STL Export gestartet"),
+    '/Export_STEP': ('export_step', (('name', str, 'Test.step'),), "STEP Export gestartet"),
+    '/fillet_edges': ('fillet_edges', (('radius', float, 0.3),), "Fillet edges started"),
+    '/draw_cylinder': ('draw_cylinder', (
+        ('radius', float, None), ('height', float, None),
+        ('x', float, 0), ('y', float, 0), ('z', float, 0),
+        ('plane', _plane, 'XY'),
+    ), "Cylinder wird erstellt"),
+    '/shell_body': ('shell_body', (
+        ('thickness', float, 0.5), ('faceindex', int, 0),
+    ), "Shell body wird erstellt"),
+    '/draw_lines': ('draw_lines', (
+        ('points', _points, []), ('plane', _plane, 'XY'),
+    ), "Lines werden erstellt"),
+    '/extrude_last_sketch': ('extrude_last_sketch', (
+        ('value', float, 1.0), ('taperangle', float, None),
+    ), "Letzter Sketch wird extrudiert"),
+    '/revolve': ('revolve_profile', (('angle', float, 360),), "Profil wird revolviert"),
+    '/arc': ('arc', (
+        ('point1', _raw, [0,0]), ('point2', _raw, [1,1]), ('point3', _raw, [2,0]),
+        ('connect', bool, False), ('plane', _raw, 'XY'),
+    ), "Arc wird erstellt"),
+    '/draw_one_line': ('draw_one_line', (
+        ('x1', float, 0), ('y1', float, 0), ('z1', float, 0),
+        ('x2', float, 1), ('y2', float, 1), ('z2', float, 0),
+        ('plane', _plane, 'XY'),
+    ), "Line wird erstellt"),
+    '/holes': ('holes', (
+        ('points', _points, [[0,0]]), ('width', float, 1.0),
+        ('depth', _optional_float, None), ('faceindex', int, 0),
+    ), "Loch wird erstellt"),
+    '/create_circle': ('circle', (
+        ('radius', float, 1.0), ('x', float, 0), ('y', float, 0), ('z', float, 0),
+        ('plane', _plane, 'XY'),
+    ), "Circle wird erstellt"),
+    '/extrude_thin': ('extrude_thin', (
+        ('thickness', float, 0.5), ('distance', float, 1.0),
+    ), "Thin Extrude wird erstellt"),
+    '/select_body': ('select_body', (('name', str, ''),), "Body wird ausgewählt"),
+    '/select_sketch': ('select_sketch', (('name', str, ''),), "Sketch wird ausgewählt"),
+    '/sweep': ('sweep', (), "Sweep wird erstellt"),
+    '/spline': ('spline', (
+        ('points', _points, []), ('plane', _plane, 'XY'),
+    ), "Spline wird erstellt"),
+    '/cut_extrude': ('cut_extrude', (('depth', float, 1.0),), "Cut Extrude wird erstellt"),
+    '/circular_pattern': ('circular_pattern', (
+        ('quantity', float, None), ('axis', _axis, "X"), ('plane', _plane, 'XY'),
+    ), "Cirular Pattern wird erstellt"),
+    '/offsetplane': ('offsetplane', (
+        ('offset', float, 0.0), ('plane', _plane, 'XY'),
+    ), "Offset Plane wird erstellt"),
+    '/loft': ('loft', (('sketchcount', int, 2),), "Loft wird erstellt"),
+    '/ellipsis': ('ellipsis', (
+        ('x_center', float, 0), ('y_center', float, 0), ('z_center', float, 0),
+        ('x_major', float, 10), ('y_major', float, 0), ('z_major', float, 0),
+        ('x_through', float, 5), ('y_through', float, 4), ('z_through', float, 0),
+        ('plane', _plane, 'XY'),
+    ), "Ellipsis wird erstellt"),
+    '/sphere': ('draw_sphere', (
+        ('radius', float, 5.0), ('x', float, 0), ('y', float, 0), ('z', float, 0),
+        ('plane', _plane, 'XY'),
+    ), "Sphere wird erstellt"),
+    '/threaded': ('threaded', (
+        ('inside', bool, True), ('allsizes', int, 30),
+    ), "Threaded Feature wird erstellt"),
+    '/delete_everything': ('delete_everything', (), "Alle Bodies werden gelöscht"),
+    '/boolean_operation': ('boolean_operation', (
+        ('operation', _bool_op, 'join'),  # 'join', 'cut', 'intersect'
+    ), "Boolean Operation wird ausgeführt"),
+    '/test_connection': (None, (), "Verbindung erfolgreich"),
+    '/draw_2d_rectangle': ('draw_2d_rectangle', (
+        ('x_1', float, 0), ('y_1', float, 0), ('z_1', float, 0),
+        ('x_2', float, 1), ('y_2', float, 1), ('z_2', float, 0),
+        ('plane', _plane, 'XY'),
+    ), "2D Rechteck wird erstellt"),
+    # Parameter-Reihenfolge: axis_one, axis_two, quantity_one, quantity_two, distance_one, distance_two, plane
+    '/rectangular_pattern': ('rectangular_pattern', (
+        ('axis_one', _axis, "X"), ('axis_two', _axis, "Y"),
+        ('quantity_one', float, 2), ('quantity_two', float, 2),
+        ('distance_one', float, 5), ('distance_two', float, 5),
+        ('plane', _plane, 'XY'),
+    ), "Rectangular Pattern wird erstellt"),
+    '/draw_text': ('draw_text', (
+        ('text', str, "Hello"), ('thickness', float, 0.5),
+        ('x_1', float, 0), ('y_1', float, 0), ('z_1', float, 0),
+        ('x_2', float, 10), ('y_2', float, 4), ('z_2', float, 0),
+        ('extrusion_value', float, 1.0), ('plane', _plane, 'XY'),
+    ), "Text wird erstellt"),
+    '/move_body': ('move_body', (
+        ('x', float, 0), ('y', float, 0), ('z', float, 0),
+    ), "Body wird verschoben"),
+}
+
+
+if orjson is not None:
+    # orjson liefert direkt bytes und liest bytes, ohne Umweg über str
+    encode_response = orjson.dumps
+    decode_body = orjson.loads
+else:
+    # Ein Encoder für alle Antworten, die Payloads sind flache Dicts -> keine Zyklenprüfung
+    _encode_json = json.JSONEncoder(check_circular=False).encode
+    # Ein Decoder für alle Requests, spart json.loads die Encoding-Erkennung und den Decoder-Lookup
+    _decode_json = json.JSONDecoder().decode
+
+    def encode_response(payload):
+        """Serializes a response payload to the bytes written to the socket"""
+        return _encode_json(payload).encode('utf-8')
+
+    def decode_body(body):
+        """Parses the raw request body"""
+        return _decode_json(body.decode('utf-8'))
+
+def _compile_route(task_name, args, message):
+    """
+    Builds the argument extractor of a route once at import.
+    The JSON keys are read with one itemgetter call and converted in one pass;
+    routes that only take floats are converted with a single map(float, ...).
+    The response never changes and is encoded once here as well
+    """
+    keys = tuple(key for key, convert, default in args)
+    converters = tuple(convert for key, convert, default in args)
+    defaults = tuple(zip(keys, (default for key, convert, default in args)))
+    if len(keys) > 1:
+        getter = operator.itemgetter(*keys)
+    elif keys:
+        key = keys[0]
+        getter = lambda data: (data[key],)
+    else:
+        getter = lambda data: ()
+
+    key_set = frozenset(keys)
+
+    def read(data):
+        if key_set <= data.keys():
+            return getter(data)
+        # Nicht alle Keys vorhanden (häufig, z.B. ohne plane) -> Defaults verwenden
+        return [data.get(key, default) for key, default in defaults]
+
+    if converters and all(convert is float for convert in converters):
+        def extract(data):
+            return tuple(map(float, read(data)))
+    else:
+        def extract(data):
+            return tuple([convert(value) for convert, value in zip(converters, read(data))])
+
+    response = encode_response({"message": message})
+    return (task_name, extract, response)
+
+POST_ROUTES = {path: _compile_route(*route) for path, route in POST_ROUTES.items()}
+
+# Antwort von /set_parameter: "Parameter <name> wird gesetzt"
+_SET_PARAM_PREFIX = "Parameter "
+_SET_PARAM_SUFFIX = " wird gesetzt"
+
+def set_parameter_args(data):
+    """
+    Validates a /set_parameter body and returns the task arguments (name, expression).
+    param.expression only accepts strings, so JSON numbers are converted here
+    """
+    name = data.get('name')
+    value = data.get('value')
+    # value darf 0 sein, nur fehlende Werte ablehnen
+    if name is None or value is None:
+        raise ValueError("name and value required")
+    # bool ist eine Unterklasse von int, True wäre sonst der Ausdruck "True"
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)) or value == "":
+        raise ValueError("value must be a number or a non-empty expression")
+    if not isinstance(value, str):
+        value = str(value)
+    return (name, value)
+
+def current_parameters():
+    """
+    Returns the parameter snapshot. The UI thread is only asked if the model is marked dirty,
+    tasks are still queued or the last check is older than PARAMETER_TTL
+    (edits in Fusion that no command reports only show up after the TTL).
+    Concurrent GETs share one refresh_parameters task.
+    Returns None if the queue is full or the UI thread does not answer in time
+    """
+    global _pending_refresh
+    if not _param_dirty and task_queue.empty() and time.monotonic() - _param_checked < PARAMETER_TTL:
+        return ModelParameterSnapshot
+    with _refresh_lock:
+        result = _pending_refresh
+        if result is None:
+            result = concurrent.futures.Future()
+            if not queue_task('refresh_parameters', (result,)):
+                return None
+            _pending_refresh = result
+    try:
+        return result.result(timeout=PARAMETER_TIMEOUT)
+    except concurrent.futures.TimeoutError:
+        return None
+
+# Fertig kodierte GET Antworten, (snapshot, bytes). Solange der UI Thread keinen
+# neuen Snapshot erstellt hat, wird nichts neu serialisiert
+_count_response = (None, b'')
+_list_response = (None, b'')
+
+def count_parameters():
+    global _count_response
+    snapshot = current_parameters()
+    if snapshot is None:
+        return None
+    if _count_response[0] is not snapshot:
+        _count_response = (snapshot, encode_response({"user_parameter_count": len(snapshot)}))
+    return _count_response[1]
+
+def list_parameters():
+    global _list_response
+    snapshot = current_parameters()
+    if snapshot is None:
+        return None
+    if _list_response[0] is not snapshot:
+        _list_response = (snapshot, encode_response({"ModelParameter": format_model_parameters(snapshot)}))
+    return _list_response[1]
+
+# Fehlerantworten als JSON (der MCP Server liest jede Antwort mit response.json()),
+# die festen Texte werden einmal beim Import kodiert
+ERROR_MESSAGES = {
+    HTTPStatus.BAD_REQUEST: "name and value required",
+    HTTPStatus.NOT_FOUND: "Not Found",
+    HTTPStatus.SERVICE_UNAVAILABLE: "Queue full",
+    HTTPStatus.REQUEST_ENTITY_TOO_LARGE: "Request body too large",
+}
+# Nach diesen Fehlern ist der Request evtl. nicht vollständig gelesen -> Verbindung schließen
+CLOSE_CONNECTION_STATUSES = frozenset({HTTPStatus.INTERNAL_SERVER_ERROR, HTTPStatus.REQUEST_ENTITY_TOO_LARGE})
+ERROR_RESPONSES = {
+    status: encode_response({"error": True, "message": message})
+    for status, message in ERROR_MESSAGES.items()
+}
+
+def request_path(path):
+    """
+    Route key of a request path, a query string is cut off.
+    Paths without '?' (the normal case) are returned unchanged without splitting
+    """
+    if '?' in path:
+        return path.partition('?')[0]
+    return path
+
+# GET Routen: path -> Funktion, die den fertig kodierten Body liefert (None: kein Snapshot)
+GET_ROUTES = {
+    '/count_parameters': count_parameters,
+    '/list_parameters': list_parameters,
+}
+
+
 class Handler(BaseHTTPRequestHandler):
+    # Verbindung bleibt offen (keep-alive), jede Antwort braucht daher Content-Length
+    protocol_version = 'HTTP/1.1'
+    # Socket Timeout, damit ein hängender Client den Server (und stop()) nicht blockiert
+    timeout = REQUEST_TIMEOUT
+    # Kleine JSON Antworten sofort senden (TCP_NODELAY) und Header + Body gepuffert
+    # in einem Rutsch schreiben, handle_one_request flusht nach jeder Anfrage
+    disable_nagle_algorithm = True
+    wbufsize = -1
+
+    def send_json(self, body, status=HTTPStatus.OK, close=False):
+        """
+        Sends already encoded JSON bytes with Content-Length.
+        Status line, headers and body end up in the write buffer and leave in one write
+        """
+        self.send_response(status)
+        self.send_header('Content-type','application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if close:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json_error(self, status, message=None, close=None):
+        """
+        Sends an error as JSON, fixed messages come precomputed from ERROR_RESPONSES.
+        close=None closes the connection for the statuses in CLOSE_CONNECTION_STATUSES
+        """
+        if message is None:
+            body = ERROR_RESPONSES[status]
+        else:
+            body = encode_response({"error": True, "message": message})
+        self.log_error("code %d, message %s", status, message or ERROR_MESSAGES[status])
+        if close is None:
+            close = status in CLOSE_CONNECTION_STATUSES
+        self.send_json(body, status, close=close)
+
+    def log_request(self, code='-', size='-'):
+        # Access Log nur bei Bedarf, Fehler laufen weiterhin über log_error
+        if LOG_REQUESTS:
+            super().log_request(code, size)
+
     def do_GET(self):
-        global ModelParameterSnapshot
         try:
-            if self.path == '/count_parameters':
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"user_parameter_count": len(ModelParameterSnapshot)}).encode('utf-8'))
-            elif self.path == '/list_parameters':
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"ModelParameter": ModelParameterSnapshot}).encode('utf-8'))
-           
-            else:
-                self.send_error(404,'Not Found')
+            route = GET_ROUTES.get(request_path(self.path))
+            if route is None:
+                self.send_json_error(HTTPStatus.NOT_FOUND)
+                return
+            body = route()
+            if body is None:
+                # Kein aktueller Snapshot, lieber Fehler als veraltete Werte
+                self.send_json_error(HTTPStatus.SERVICE_UNAVAILABLE, "Parameter snapshot not available, UI thread busy")
+                return
+            self.send_json(body)
         except Exception as e:
-            self.send_error(500,str(e))
+            self.send_json_error(HTTPStatus.INTERNAL_SERVER_ERROR, str(e))
 
     def do_POST(self):
         try:
-            content_length = int(self.headers.get('Content-Length',0))
-            post_data = self.rfile.read(content_length)
-            data = json.loads(post_data) if post_data else {}
-            path = self.path
-
-            # Alle Aktionen in die Queue legen
-            if path.startswith('/set_parameter'):
-                name = data.get('name')
-                value = data.get('value')
-                if name and value:
-                    task_queue.put(('set_parameter', name, value))
-                    self.send_response(200)
-                    self.send_header('Content-type','application/json')
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"message": f"Parameter {name} wird gesetzt"}).encode('utf-8'))
-
-            elif path == '/undo':
-                task_queue.put(('undo',))
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"message": "Undo wird ausgeführt"}).encode('utf-8'))
-
-            elif path == '/Box':
-                height = float(data.get('height',5))
-                width = float(data.get('width',5))
-                depth = float(data.get('depth',5))
-                x = float(data.get('x',0))
-                y = float(data.get('y',0))
-                z = float(data.get('z',0))
-                Plane = data.get('plane',None)  # 'XY', 'XZ', 'YZ' or None
-
-                task_queue.put(('draw_box', height, width, depth,x,y,z, Plane))
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"message": "Box wird erstellt"}).encode('utf-8'))
-
-            elif path == '/Witzenmann':
-                scale = data.get('scale',1.0)
-                z = float(data.get('z',0))
-                task_queue.put(('draw_witzenmann', scale,z))
-
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"message": "Witzenmann-Logo wird erstellt"}).encode('utf-8'))
-
-            elif path == '/Export_STL':
-                name = str(data.get('Name','Test.stl'))
-                task_queue.put(('export_stl', name))
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"message": "STL Export gestartet"}).encode('utf-8'))
-
-
-            elif path == '/Export_STEP':
-                name = str(data.get('name','Test.step'))
-                task_queue.put(('export_step',name))
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"message": "STEP Export gestartet"}).encode('utf-8'))
-
-
-            elif path == '/fillet_edges':
-                radius = float(data.get('radius',0.3)) #0.3 as default
-                task_queue.put(('fillet_edges',radius))
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"message": "Fillet edges started"}).encode('utf-8'))
-
-            elif path == '/draw_cylinder':
-                radius = float(data.get('radius'))
-                height = float(data.get('height'))
-                x = float(data.get('x',0))
-                y = float(data.get('y',0))
-                z = float(data.get('z',0))
-                plane = data.get('plane', 'XY')  # 'XY', 'XZ', 'YZ'
-                task_queue.put(('draw_cylinder', radius, height, x, y,z, plane))
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"message": "Cylinder wird erstellt"}).encode('utf-8'))
-            
-
-            elif path == '/shell_body':
-                thickness = float(data.get('thickness',0.5)) #0.5 as default
-                faceindex = int(data.get('faceindex',0))
-                task_queue.put(('shell_body', thickness, faceindex))
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"message": "Shell body wird erstellt"}).encode('utf-8'))
-
-            elif path == '/draw_lines':
-                points = data.get('points', [])
-                Plane = data.get('plane', 'XY')  # 'XY', 'XZ', 'YZ'
-                task_queue.put(('draw_lines', points, Plane))
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"message": "Lines werden erstellt"}).encode('utf-8'))
-            
-            elif path == '/extrude_last_sketch':
-                value = float(data.get('value',1.0)) #1.0 as default
-                taperangle = float(data.get('taperangle')) #0.0 as default
-                task_queue.put(('extrude_last_sketch', value,taperangle))
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"message": "Letzter Sketch wird extrudiert"}).encode('utf-8'))
-                
-            elif path == '/revolve':
-                angle = float(data.get('angle',360)) #360 as default
-                #axis = data.get('axis','X')  # 'X', 'Y', 'Z'
-                task_queue.put(('revolve_profile', angle))
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"message": "Profil wird revolviert"}).encode('utf-8'))
-            elif path == '/arc':
-                point1 = data.get('point1', [0,0])
-                point2 = data.get('point2', [1,1])
-                point3 = data.get('point3', [2,0])
-                connect = bool(data.get('connect', False))
-                plane = data.get('plane', 'XY')  # 'XY', 'XZ', 'YZ'
-                task_queue.put(('arc', point1, point2, point3, connect, plane))
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"message": "Arc wird erstellt"}).encode('utf-8'))
-            
-            elif path == '/draw_one_line':
-                x1 = float(data.get('x1',0))
-                y1 = float(data.get('y1',0))
-                z1 = float(data.get('z1',0))
-                x2 = float(data.get('x2',1))
-                y2 = float(data.get('y2',1))
-                z2 = float(data.get('z2',0))
-                plane = data.get('plane', 'XY')  # 'XY', 'XZ', 'YZ'
-                task_queue.put(('draw_one_line', x1, y1, z1, x2, y2, z2, plane))
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"message": "Line wird erstellt"}).encode('utf-8'))
-            
-            elif path == '/holes':
-                points = data.get('points', [[0,0]])
-                width = float(data.get('width', 1.0))
-                faceindex = int(data.get('faceindex', 0))
-                distance = data.get('depth', None)
-                if distance is not None:
-                    distance = float(distance)
-                through = bool(data.get('through', False))
-                task_queue.put(('holes', points, width, distance,  faceindex))
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                
-                self.wfile.write(json.dumps({"message": "Loch wird erstellt"}).encode('utf-8'))
-
-            elif path == '/create_circle':
-                radius = float(data.get('radius',1.0))
-                x = float(data.get('x',0))
-                y = float(data.get('y',0))
-                z = float(data.get('z',0))
-                plane = data.get('plane', 'XY')  # 'XY', 'XZ', 'YZ'
-                task_queue.put(('circle', radius, x, y,z, plane))
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"message": "Circle wird erstellt"}).encode('utf-8'))
-
-            elif path == '/extrude_thin':
-                thickness = float(data.get('thickness',0.5)) #0.5 as default
-                distance = float(data.get('distance',1.0)) #1.0 as default
-                task_queue.put(('extrude_thin', thickness,distance))
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"message": "Thin Extrude wird erstellt"}).encode('utf-8'))
-
-            elif path == '/select_body':
-                name = str(data.get('name', ''))
-                task_queue.put(('select_body', name))
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"message": "Body wird ausgewählt"}).encode('utf-8'))
-
-            elif path == '/select_sketch':
-                name = str(data.get('name', ''))
-                task_queue.put(('select_sketch', name))
-       
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"message": "Sketch wird ausgewählt"}).encode('utf-8'))
-
-            elif path == '/sweep':
-                # enqueue a tuple so process_task recognizes the command
-                task_queue.put(('sweep',))
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"message": "Sweep wird erstellt"}).encode('utf-8'))
-            
-            elif path == '/spline':
-                points = data.get('points', [])
-                plane = data.get('plane', 'XY')  # 'XY', 'XZ', 'YZ'
-                task_queue.put(('spline', points, plane))
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"message": "Spline wird erstellt"}).encode('utf-8'))
-
-            elif path == '/cut_extrude':
-                depth = float(data.get('depth',1.0)) #1.0 as default
-                task_queue.put(('cut_extrude', depth))
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"message": "Cut Extrude wird erstellt"}).encode('utf-8'))
-            
-            elif path == '/circular_pattern':
-                quantity = float(data.get('quantity',))
-                axis = str(data.get('axis',"X"))
-                plane = str(data.get('plane', 'XY'))  # 'XY', 'XZ', 'YZ'
-                task_queue.put(('circular_pattern',quantity,axis,plane))
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"message": "Cirular Pattern wird erstellt"}).encode('utf-8'))
-            
-            elif path == '/offsetplane':
-                offset = float(data.get('offset',0.0))
-                plane = str(data.get('plane', 'XY'))  # 'XY', 'XZ', 'YZ'
-               
-                task_queue.put(('offsetplane', offset, plane))
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"message": "Offset Plane wird erstellt"}).encode('utf-8'))
-
-            elif path == '/loft':
-                sketchcount = int(data.get('sketchcount',2))
-                task_queue.put(('loft', sketchcount))
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"message": "Loft wird erstellt"}).encode('utf-8'))
-            
-            elif path == '/ellipsis':
-                 x_center = float(data.get('x_center',0))
-                 y_center = float(data.get('y_center',0))
-                 z_center = float(data.get('z_center',0))
-                 x_major = float(data.get('x_major',10))
-                 y_major = float(data.get('y_major',0))
-                 z_major = float(data.get('z_major',0))
-                 x_through = float(data.get('x_through',5))
-                 y_through = float(data.get('y_through',4))
-                 z_through = float(data.get('z_through',0))
-                 plane = str(data.get('plane', 'XY'))  # 'XY', 'XZ', 'YZ'
-                 task_queue.put(('ellipsis', x_center, y_center, z_center,
-                                  x_major, y_major, z_major, x_through, y_through, z_through, plane))
-                 self.send_response(200)
-                 self.send_header('Content-type','application/json')
-                 self.end_headers()
-                 self.wfile.write(json.dumps({"message": "Ellipsis wird erstellt"}).encode('utf-8'))
-                 
-            elif path == '/sphere':
-                radius = float(data.get('radius',5.0))
-                x = float(data.get('x',0))
-                y = float(data.get('y',0))
-                z = float(data.get('z',0))
-                plane = data.get('plane', 'XY')  # 'XY', 'XZ', 'YZ'
-                task_queue.put(('draw_sphere', radius, x, y,z, plane))
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"message": "Sphere wird erstellt"}).encode('utf-8'))
-
-            elif path == '/threaded':
-                inside = bool(data.get('inside', True))
-                allsizes = int(data.get('allsizes', 30))
-                task_queue.put(('threaded', inside, allsizes))
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"message": "Threaded Feature wird erstellt"}).encode('utf-8'))
-                
-            elif path == '/delete_everything':
-                task_queue.put(('delete_everything',))
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"message": "Alle Bodies werden gelöscht"}).encode('utf-8'))
-                
-            elif path == '/boolean_operation':
-                operation = data.get('operation', 'join')  # 'join', 'cut', 'intersect'
-                task_queue.put(('boolean_operation', operation))
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"message": "Boolean Operation wird ausgeführt"}).encode('utf-8'))
-            
-            elif path == '/test_connection':
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"message": "Verbindung erfolgreich"}).encode('utf-8'))
-            
-            elif path == '/draw_2d_rectangle':
-                x_1 = float(data.get('x_1',0))
-                y_1 = float(data.get('y_1',0))
-                z_1 = float(data.get('z_1',0))
-                x_2 = float(data.get('x_2',1))
-                y_2 = float(data.get('y_2',1))
-                z_2 = float(data.get('z_2',0))
-                plane = data.get('plane', 'XY')  # 'XY', 'XZ', 'YZ'
-                task_queue.put(('draw_2d_rectangle', x_1, y_1, z_1, x_2, y_2, z_2, plane))
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"message": "2D Rechteck wird erstellt"}).encode('utf-8'))
-            
-            
-            elif path == '/rectangular_pattern':
-                 quantity_one = float(data.get('quantity_one',2))
-                 distance_one = float(data.get('distance_one',5))
-                 axis_one = str(data.get('axis_one',"X"))
-                 quantity_two = float(data.get('quantity_two',2))
-                 distance_two = float(data.get('distance_two',5))
-                 axis_two = str(data.get('axis_two',"Y"))
-                 plane = str(data.get('plane', 'XY'))  # 'XY', 'XZ', 'YZ'
-                 # Parameter-Reihenfolge: axis_one, axis_two, quantity_one, quantity_two, distance_one, distance_two, plane
-                 task_queue.put(('rectangular_pattern', axis_one, axis_two, quantity_one, quantity_two, distance_one, distance_two, plane))
-                 self.send_response(200)
-                 self.send_header('Content-type','application/json')
-                 self.end_headers()
-                 self.wfile.write(json.dumps({"message": "Rectangular Pattern wird erstellt"}).encode('utf-8'))
-                 
-            elif path == '/draw_text':
-                 text = str(data.get('text',"Hello"))
-                 x_1 = float(data.get('x_1',0))
-                 y_1 = float(data.get('y_1',0))
-                 z_1 = float(data.get('z_1',0))
-                 x_2 = float(data.get('x_2',10))
-                 y_2 = float(data.get('y_2',4))
-                 z_2 = float(data.get('z_2',0))
-                 extrusion_value = float(data.get('extrusion_value',1.0))
-                 plane = str(data.get('plane', 'XY'))  # 'XY', 'XZ', 'YZ'
-                 thickness = float(data.get('thickness',0.5))
-                 task_queue.put(('draw_text', text,thickness, x_1, y_1, z_1, x_2, y_2, z_2, extrusion_value, plane))
-                 self.send_response(200)
-                 self.send_header('Content-type','application/json')
-                 self.end_headers()
-                 self.wfile.write(json.dumps({"message": "Text wird erstellt"}).encode('utf-8'))
-                 
-            elif path == '/move_body':
-                x = float(data.get('x',0))
-                y = float(data.get('y',0))
-                z = float(data.get('z',0))
-                task_queue.put(('move_body', x, y, z))
-                self.send_response(200)
-                self.send_header('Content-type','application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"message": "Body wird verschoben"}).encode('utf-8'))
-            
+            try:
+                content_length = int(self.headers.get('Content-Length',0))
+            except ValueError:
+                content_length = -1
+            if content_length < 0:
+                # Kaputter Header -> Body-Grenze unbekannt, Verbindung nicht weiterverwenden
+                self.send_json_error(HTTPStatus.BAD_REQUEST, "Invalid Content-Length", close=True)
+                return
+            if content_length > MAX_REQUEST_BODY:
+                self.send_json_error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+                return
+            # Ohne Body (z.B. /undo) nichts lesen und nichts parsen
+            try:
+                data = decode_body(self.rfile.read(content_length)) if content_length > 0 else {}
+            except ValueError:
+                # Body ist vollständig gelesen, die Verbindung bleibt nutzbar
+                self.send_json_error(HTTPStatus.BAD_REQUEST, "Invalid JSON body")
+                return
+            if not isinstance(data, dict):
+                self.send_json_error(HTTPStatus.BAD_REQUEST, "JSON object required")
+                return
+            path = request_path(self.path)
+
+            # Alle Aktionen in die Queue legen, ein Dict-Lookup pro Request
+            route = POST_ROUTES.get(path)
+            if route is not None:
+                self.handle_route(route, data)
+            elif path == '/set_parameter':
+                self.handle_set_parameter(data)
+            elif path == '/batch':
+                self.handle_batch(data)
             else:
-                self.send_error(404,'Not Found')
+                self.send_json_error(HTTPStatus.NOT_FOUND)
 
         except Exception as e:
-            self.send_error(500,str(e))
+            self.send_json_error(HTTPStatus.INTERNAL_SERVER_ERROR, str(e))
+
+    def handle_set_parameter(self, data):
+        """Queues set_parameter, the response contains the parameter name"""
+        try:
+            name, value = set_parameter_args(data)
+        except ValueError as e:
+            self.send_json_error(HTTPStatus.BAD_REQUEST, str(e))
+            return
+        if not queue_task('set_parameter', (name, value)):
+            self.send_json_error(HTTPStatus.SERVICE_UNAVAILABLE)
+            return
+        self.send_json(encode_response({"message": _SET_PARAM_PREFIX + str(name) + _SET_PARAM_SUFFIX}))
+
+    def handle_batch(self, data):
+        """
+        Queues a list of commands {"op": <route>, "params": {...}} in one request.
+        All arguments are converted first, so an invalid command rejects the whole batch
+        """
+        commands = data.get('commands')
+        if not isinstance(commands, list):
+            self.send_json_error(HTTPStatus.BAD_REQUEST, "commands required")
+            return
+        tasks = []
+        for index, command in enumerate(commands):
+            if not isinstance(command, dict):
+                self.send_json_error(HTTPStatus.BAD_REQUEST, "Command {}: object required".format(index))
+                return
+            op = command.get('op')
+            route = POST_ROUTES.get('/' + str(op))
+            if route is None and op != 'set_parameter':
+                self.send_json_error(HTTPStatus.BAD_REQUEST, "Command {}: unknown op {}".format(index, op))
+                return
+            params = command.get('params')
+            if params is None:
+                params = {}
+            elif not isinstance(params, dict):
+                self.send_json_error(HTTPStatus.BAD_REQUEST, "Command {}: params must be an object".format(index))
+                return
+            if route is None:
+                # set_parameter hat keine Route in POST_ROUTES, gleiche Prüfung wie /set_parameter
+                try:
+                    tasks.append(('set_parameter', set_parameter_args(params)))
+                except ValueError as e:
+                    self.send_json_error(HTTPStatus.BAD_REQUEST, "Command {} ({}): {}".format(index, op, e))
+                    return
+                continue
+            task_name, extract, response = route
+            if task_name is not None:
+                try:
+                    tasks.append((task_name, extract(params)))
+                except (KeyError, TypeError, ValueError) as e:
+                    self.send_json_error(HTTPStatus.BAD_REQUEST, "Command {} ({}): {}".format(index, op, e))
+                    return
+        if not queue_tasks(tasks):
+            self.send_json_error(HTTPStatus.SERVICE_UNAVAILABLE)
+            return
+        self.send_json(encode_response({"accepted": len(tasks)}))
+
+    def handle_route(self, route, data):
+        """Converts the JSON arguments of a route and puts the task into the queue"""
+        task_name, extract, response = route
+        if task_name is not None:
+            try:
+                args = extract(data)
+            except (KeyError, TypeError, ValueError) as e:
+                # Ungültige Argumente sind ein Fehler des Clients, wie in handle_batch
+                self.send_json_error(HTTPStatus.BAD_REQUEST, str(e))
+                return
+            if not queue_task(task_name, args):
+                # UI-Thread kommt nicht hinterher -> Client soll es später erneut versuchen
+                self.send_json_error(HTTPStatus.SERVICE_UNAVAILABLE)
+                return
+        self.send_json(response)
 
 def run_server():
     global httpd
     server_address = ('localhost',5000)
-    httpd = HTTPServer(server_address, Handler)
+    httpd = ThreadingHTTPServer(server_address, Handler)
     httpd.serve_forever()
 
+def shutdown_server():
+    """Stops serve_forever and closes the listening socket"""
+    global httpd
+    server = httpd
+    if server:
+        try:
+            server.shutdown()
+            server.server_close()
+        except:
+            pass
+        httpd = None
+
+def force_close_server():
+    """Closes the listening socket if shutdown() did not finish in time"""
+    global httpd
+    server = httpd
+    if server:
+        try:
+            server.socket.close()
+        except:
+            pass
+        httpd = None
+
 
 def run(context):
-    global app, ui, design, handlers, stopFlag, customEvent
+    global app, ui, design, handlers, stopFlag, customEvent, commandTerminatedHandler
     try:
         app = adsk.core.Application.get()
         ui = app.userInterface
@@ -1703,9 +1919,19 @@ def run(context):
             ui.messageBox("Kein aktives Design geöffnet!")
             return
 
+        # Ebenen aus einem früheren Lauf gehören evtl. zu einem anderen Dokument
+        _offset_planes.clear()
+
         # Initialer Snapshot
-        global ModelParameterSnapshot
+        global ModelParameterSnapshot, _param_dirty, _param_cache_version, _param_checked, _pending_refresh
         ModelParameterSnapshot = get_model_parameters(design)
+        _param_cache_version = parameter_revision(design)
+        _param_dirty = False
+        _param_checked = time.monotonic()
+        # Ein Refresh aus einem früheren Lauf wurde evtl. von stop() verworfen
+        _pending_refresh = None
+
+        register_task_handlers(design, ui)
 
         # Custom Event registrieren
         customEvent = app.registerCustomEvent(myCustomEvent) #Every 200ms we create a custom event which doesnt interfere with Fusion main thread
@@ -1713,6 +1939,10 @@ def run(context):
         customEvent.add(onTaskEvent) # Here we add the event handler
         handlers.append(onTaskEvent)
 
+        # Änderungen direkt in Fusion (nicht über das Add-In) erkennen
+        commandTerminatedHandler = CommandTerminatedHandler()
+        ui.commandTerminated.add(commandTerminatedHandler)
+
         # Task Thread starten
         stopFlag = threading.Event()
         taskThread = TaskThread(stopFlag)
@@ -1734,51 +1964,51 @@ def run(context):
 
 
 def stop(context):
-    global stopFlag, httpd, task_queue, handlers, app, customEvent
+    global stopFlag, httpd, task_queue, handlers, app, customEvent, commandTerminatedHandler
     
-    # Stop the task thread
+    # Stop the task thread as first step, task_available weckt ihn sofort auf
     if stopFlag:
         stopFlag.set()
+        task_available.set()
 
-    # Clean up event handlers
-    for handler in handlers:
-        try:
-            if customEvent:
-                customEvent.remove(handler)
-        except:
-            pass
-    
-    handlers.clear()
+    # HTTP Server parallel stoppen, shutdown() wartet bis serve_forever zurückkehrt
+    serverThread = threading.Thread(target=shutdown_server, daemon=True)
+    serverThread.start()
 
     # Clear the queue without processing (avoid freezing)
-    while not task_queue.empty():
-        try:
-            task_queue.get_nowait() 
-            if task_queue.empty(): 
-                break
-        except:
-            break
+    clear_tasks()
+    _offset_planes.clear()
 
-    # Stop HTTP server
-    if httpd:
-        try:
-            httpd.shutdown()
-        except:
-            pass
+    serverThread.join(timeout=SHUTDOWN_TIMEOUT)
+    if serverThread.is_alive():
+        # Server hängt in einem Request -> Socket hart schließen, damit das Add-In entladen wird
+        force_close_server()
 
-  
-    if httpd:
+    # Clean up event handlers
+    if customEvent and handlers:
+        for handler in handlers:
+            try:
+                customEvent.remove(handler)
+            except:
+                pass
+    handlers.clear()
+    if commandTerminatedHandler and ui:
         try:
-            httpd.shutdown()
-            httpd.server_close()
+            ui.commandTerminated.remove(commandTerminatedHandler)
         except:
             pass
-        httpd = None
+    commandTerminatedHandler = None
+
+    # Modale Box blockiert stop() bis zum Klick -> bei automatisiertem Entladen abschaltbar
+    if os.environ.get("FUSION_MCP_SILENT_STOP"):
+        return
     try:
-        app = adsk.core.Application.get()
-        if app:
-            ui = app.userInterface
-            if ui:
-                ui.messageBox("Fusion HTTP Add-In gestoppt")
+        # app/ui aus run() wiederverwenden, nur falls run() nicht lief neu holen
+        _ui = ui
+        if _ui is None:
+            _app = app or adsk.core.Application.get()
+            _ui = _app.userInterface if _app else None
+        if _ui:
+            _ui.messageBox("Fusion HTTP Add-In gestoppt")
     except:
         pass
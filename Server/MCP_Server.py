@@ -853,6 +853,33 @@ def loft(sketchcount: int):
         logging.error("Loft failed: %s", e)
         raise
 
+@mcp.tool()
+def batch(commands: list):
+    """
+    Du kannst mehrere Befehle in einem einzigen Request an Fusion 360 schicken.
+    commands ist eine Liste von {"op": <Endpoint>, "params": {...}},
+    op ist der Name des Endpoints ohne "/", z.B. "Box", "draw_cylinder", "extrude_last_sketch".
+    Erlaubt sind alle POST Endpoints inklusive "set_parameter" ({"name": ..., "value": ...}),
+    nicht aber count_parameters, list_parameters und batch selbst.
+    params sind die gleichen Werte, die der einzelne Endpoint erwartet.
+    Die Befehle werden in der angegebenen Reihenfolge ausgeführt.
+    Ist ein Befehl ungültig, wird keiner der Befehle ausgeführt.
+    Beispiel:
+    [{"op": "Box", "params": {"height": 2, "width": 3, "depth": 4}},
+     {"op": "fillet_edges", "params": {"radius": 0.2}}]
+    """
+    try:
+        endpoint = config.ENDPOINTS["batch"]
+        headers = config.HEADERS
+        data = {
+            "commands": commands
+        }
+        return send_request(endpoint, data, headers)
+
+    except requests.RequestException as e:
+        logging.error("Batch failed: %s", e)
+        raise
+
 
 
 
@@ -40,6 +40,7 @@ ENDPOINTS = {
     "rectangular_pattern": f"{BASE_URL}/rectangular_pattern",
     "draw_text": f"{BASE_URL}/draw_text",
     "move_body": f"{BASE_URL}/move_body",
+    "batch": f"{BASE_URL}/batch",
     
 }
 